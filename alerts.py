@@ -0,0 +1,320 @@
+# alerts.py
+"""Background alert evaluation.
+
+Readings are evaluated once each, in id order, as they are written (from
+the app, the importer or the ingestion service), instead of on page render.
+A single-row cursor in `alert_progress` records the last reading evaluated;
+each batch of new readings, the alerts it raises, the per-patient state it
+updates and the cursor move commit in one transaction, so a reading is
+evaluated exactly once even if the app and `python alerts.py run` both run.
+Writers insert readings through db.lock_reading_inserts(), so ids commit
+in order and a reading is never committed behind the cursor.
+
+Per-patient state (last alert per rule, streaks of abnormal readings, the
+last few values of trended vitals) is small and bounded, so evaluating a
+reading costs the same however much history the patient has.
+
+    python alerts.py run            # evaluate continuously
+    python alerts.py once           # evaluate what is pending, then exit
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import select, update, delete, func
+
+from db import engine, Alert, AlertState, AlertProgress, Patient, Reading
+from perf import section
+from rules import registry, ALERT_LEVELS
+
+ALERT_POLL_INTERVAL = float(os.environ.get("ALERT_POLL_INTERVAL", "2"))
+ALERT_BATCH_SIZE = int(os.environ.get("ALERT_BATCH_SIZE", "1000"))
+# Same or lower level alerts for one rule are suppressed for this long
+ALERT_DEBOUNCE_MINUTES = float(os.environ.get("ALERT_DEBOUNCE_MINUTES", "60"))
+# Consecutive readings at warning or above before the alert escalates a level
+ALERT_ESCALATE_AFTER = int(os.environ.get("ALERT_ESCALATE_AFTER", "3"))
+# Readings taken longer ago than this (backfills, imports) raise no alerts
+ALERT_MAX_AGE_HOURS = float(os.environ.get("ALERT_MAX_AGE_HOURS", "48"))
+
+WARNING = ALERT_LEVELS.index("warning")
+URGENT = ALERT_LEVELS.index("urgent")
+
+TREND_RULES = [
+    {
+        "name": "systolic_rising",
+        "vital": "systolic",
+        "direction": 1,
+        "count": 3,
+        "window_hours": 24,
+        "level": "warning",
+        "message": "📈 Systolic rising across 3 readings within 24 hours",
+    },
+    {
+        "name": "spo2_falling",
+        "vital": "spo2",
+        "direction": -1,
+        "count": 3,
+        "window_hours": 24,
+        "level": "warning",
+        "message": "📉 SpO₂ falling across 3 readings within 24 hours",
+    },
+]
+
+EVALUATED_COLUMNS = [Reading.id, Reading.patient_id, Reading.timestamp, Reading.systolic, Reading.diastolic,
+                     Reading.glucose_mg_dl, Reading.temp_c, Reading.spo2, Reading.sample_count]
+
+
+class AlertCursorMoved(RuntimeError):
+    """Another evaluator committed the same readings first"""
+
+
+# --- Evaluation ---
+def new_state():
+    return {"last": {}, "streak": {}, "trend": {}}
+
+
+def _debounced(state, rule, level, ts, debounce):
+    """True if an alert at `level` for `rule` at `ts` is suppressed; otherwise
+    records it as the rule's last alert"""
+    last = state["last"].get(rule)
+    if last is not None:
+        last_level, last_ts = last[0], datetime.fromisoformat(last[1])
+        if level <= last_level and timedelta(0) <= ts - last_ts < debounce:
+            return True
+    state["last"][rule] = [level, ts.isoformat()]
+    return False
+
+
+def evaluate(state, reading, rule_set, debounce=timedelta(minutes=ALERT_DEBOUNCE_MINUTES),
+             escalate_after=ALERT_ESCALATE_AFTER, trend_rules=TREND_RULES):
+    """Alerts (as dicts) raised by one reading; updates the patient's `state`"""
+    raised = []
+    ts = reading.timestamp
+
+    def alert(rule, kind, level, message):
+        if not _debounced(state, rule, level, ts, debounce):
+            raised.append({
+                "patient_id": reading.patient_id, "reading_id": reading.id, "reading_timestamp": ts,
+                "rule": rule, "kind": kind, "level": ALERT_LEVELS[level], "message": message,
+            })
+
+    for rule in rule_set.rules:
+        code = rule.code(reading)
+        if code < 0:
+            continue
+        level = rule.alerts[code]
+        if level < WARNING:
+            state["streak"].pop(rule.category, None)
+            continue
+        streak = state["streak"][rule.category] = state["streak"].get(rule.category, 0) + 1
+        if streak >= escalate_after and level < URGENT:
+            alert(rule.category, "escalation", level + 1, f"{rule.messages[code]} (persisting for {streak} readings)")
+        else:
+            alert(rule.category, "level", level, rule.messages[code])
+
+    for trend in trend_rules:
+        value = getattr(reading, trend["vital"])
+        if value is None:
+            continue
+        points = state["trend"].setdefault(trend["name"], [])
+        if points and ts <= datetime.fromisoformat(points[-1][0]):
+            continue  # backdated reading: trends follow the latest readings only
+        window_start = ts - timedelta(hours=trend["window_hours"])
+        points[:] = [p for p in points[-(trend["count"] - 1):] if datetime.fromisoformat(p[0]) >= window_start]
+        points.append([ts.isoformat(), value])
+        values = [p[1] for p in points]
+        if len(values) == trend["count"] and all(
+            (b - a) * trend["direction"] > 0 for a, b in zip(values, values[1:])
+        ):
+            alert(trend["name"], "trend", ALERT_LEVELS.index(trend["level"]), trend["message"])
+    return raised
+
+
+# --- Batches ---
+def _upsert_states(conn):
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(AlertState.__table__)
+    return stmt.on_conflict_do_update(index_elements=["patient_id"], set_={"state": stmt.excluded.state})
+
+
+def process_batch(bind=engine, limit=ALERT_BATCH_SIZE, rule_set=None, max_age=timedelta(hours=ALERT_MAX_AGE_HOURS)):
+    """Evaluate up to `limit` readings past the cursor in one transaction.
+
+    Returns (readings evaluated, alerts raised). The first run starts the
+    cursor at the newest existing reading, so history raises no alerts.
+    """
+    rule_set = rule_set or registry.get()
+    with bind.begin() as conn:
+        cursor = conn.execute(select(AlertProgress.last_reading_id).where(AlertProgress.id == 1)).scalar()
+        if cursor is None:
+            newest = conn.execute(select(func.coalesce(func.max(Reading.id), 0))).scalar()
+            conn.execute(AlertProgress.__table__.insert().values(id=1, last_reading_id=newest))
+            return 0, 0
+
+        rows = conn.execute(
+            select(*EVALUATED_COLUMNS).where(Reading.id > cursor).order_by(Reading.id).limit(limit)
+        ).all()
+        if not rows:
+            return 0, 0
+
+        cutoff = datetime.utcnow() - max_age
+        # Downsampled readings (retention.py) repeat archived ones: not evaluated again
+        recent = [row for row in rows if row.timestamp >= cutoff and row.sample_count is None]
+        pids = {row.patient_id for row in recent}
+        states = {
+            pid: json.loads(state)
+            for pid, state in conn.execute(
+                select(AlertState.patient_id, AlertState.state).where(AlertState.patient_id.in_(pids))
+            )
+        } if pids else {}
+        raised = []
+        for row in recent:
+            raised += evaluate(states.setdefault(row.patient_id, new_state()), row, rule_set)
+
+        if raised:
+            conn.execute(Alert.__table__.insert(), raised)
+        if pids:
+            conn.execute(_upsert_states(conn), [{"patient_id": pid, "state": json.dumps(states[pid])} for pid in pids])
+        moved = conn.execute(
+            update(AlertProgress).where(AlertProgress.id == 1, AlertProgress.last_reading_id == cursor)
+            .values(last_reading_id=rows[-1].id)
+        )
+        if moved.rowcount != 1:
+            raise AlertCursorMoved("readings already evaluated by another evaluator")
+    return len(rows), len(raised)
+
+
+class AlertEvaluator:
+    """Daemon thread running process_batch() every `interval` seconds, or
+    as soon as wake() is called after a reading is saved"""
+
+    def __init__(self, bind=engine, interval=ALERT_POLL_INTERVAL, batch_size=ALERT_BATCH_SIZE):
+        self.bind = bind
+        self.interval = interval
+        self.batch_size = batch_size
+        self.evaluated = 0
+        self.raised = 0
+        self.last_error = None
+        self.rules_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="alert-evaluator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def wake(self):
+        self._wake.set()
+
+    def run_once(self):
+        """Evaluate everything pending; returns the number of readings evaluated"""
+        total = 0
+        try:
+            registry.reload_if_changed()
+            self.rules_error = None
+        except Exception as e:
+            # A broken rule file leaves the previous rule sets in use: keep evaluating
+            self.rules_error = f"rule sets not reloaded: {e}"
+        while True:
+            with section("alerts"):
+                evaluated, raised = process_batch(self.bind, limit=self.batch_size)
+            self.evaluated += evaluated
+            self.raised += raised
+            total += evaluated
+            if evaluated < self.batch_size:
+                return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                self.last_error = self.rules_error
+            except AlertCursorMoved:
+                continue
+            except Exception as e:
+                self.last_error = str(e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+# --- Feed ---
+ALERT_FEED_COLUMNS = ["id", "created_at", "patient", "level", "message", "reading_timestamp", "acknowledged_at"]
+
+
+def alerts_frame(session, patient_id=None, include_acknowledged=False, limit=200):
+    """Alerts newest first, with patient names, as a DataFrame"""
+    stmt = select(
+        Alert.id, Alert.created_at, Patient.name.label("patient"), Alert.level, Alert.message,
+        Alert.reading_timestamp, Alert.acknowledged_at,
+    ).join(Patient, Patient.id == Alert.patient_id)
+    if patient_id is not None:
+        stmt = stmt.where(Alert.patient_id == patient_id)
+    if not include_acknowledged:
+        stmt = stmt.where(Alert.acknowledged_at.is_(None))
+    rows = session.execute(stmt.order_by(Alert.created_at.desc(), Alert.id.desc()).limit(limit)).all()
+    return pd.DataFrame.from_records(rows, columns=ALERT_FEED_COLUMNS)
+
+
+def open_alert_count(session):
+    return session.execute(select(func.count()).select_from(Alert).where(Alert.acknowledged_at.is_(None))).scalar()
+
+
+def acknowledge_alerts(session, alert_ids):
+    """Mark alerts as acknowledged; returns how many were still open"""
+    if not alert_ids:
+        return 0
+    result = session.execute(
+        update(Alert).where(Alert.id.in_(alert_ids), Alert.acknowledged_at.is_(None))
+        .values(acknowledged_at=datetime.utcnow())
+    )
+    return result.rowcount
+
+
+def delete_patient_alerts(session, patient_id):
+    session.execute(delete(Alert).where(Alert.patient_id == patient_id))
+    session.execute(delete(AlertState).where(AlertState.patient_id == patient_id))
+
+
+# --- CLI ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate new readings and raise alerts.")
+    parser.add_argument("command", choices=["run", "once"])
+    parser.add_argument("--interval", type=float, default=ALERT_POLL_INTERVAL, help="seconds between polls")
+    args = parser.parse_args(argv)
+
+    from db import init_db
+    init_db()
+    evaluator = AlertEvaluator(interval=args.interval)
+    if args.command == "once":
+        evaluated = evaluator.run_once()
+        print(f"Evaluated {evaluated} readings, raised {evaluator.raised} alerts"
+              + (f" ({evaluator.rules_error})" if evaluator.rules_error else ""))
+        return 0
+    evaluator.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Evaluated {evaluator.evaluated} readings, raised {evaluator.raised} alerts"
+                  + (f" (last error: {evaluator.last_error})" if evaluator.last_error else ""))
+    except KeyboardInterrupt:
+        evaluator.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,523 +1,703 @@
-# app.py
-import streamlit as st
-from datetime import datetime
-import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import sessionmaker, relationship, declarative_base
-import matplotlib.pyplot as plt
-
-if 'refresh' not in st.session_state:
-    st.session_state['refresh'] = False
-
-# Check the flag and rerun safely
-if st.session_state['refresh']:
-    st.session_state['refresh'] = False
-    st.rerun()
-
-
-# --- Database setup ---
-DATABASE_URL = "sqlite:///data.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-Base = declarative_base()
-SessionLocal = sessionmaker(bind=engine)
-
-def get_session():
-    """Get database session with proper error handling"""
-    return SessionLocal()
-
-# --- Models ---
-class Patient(Base):
-    __tablename__ = "patients"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
-    dob = Column(String, nullable=True)
-    sex = Column(String, nullable=True)
-    notes = Column(Text, nullable=True)
-    readings = relationship("Reading", back_populates="patient", cascade="all, delete-orphan")
-
-class Reading(Base):
-    __tablename__ = "readings"
-    id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"))
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    systolic = Column(Integer, nullable=True)
-    diastolic = Column(Integer, nullable=True)
-    glucose_mg_dl = Column(Float, nullable=True)  # mg/dL
-    temp_c = Column(Float, nullable=True)  # Celsius
-    spo2 = Column(Float, nullable=True)  # %
-    notes = Column(Text, nullable=True)
-    patient = relationship("Patient", back_populates="readings")
-
-Base.metadata.create_all(bind=engine)
-
-# --- Helper: suggestions ---
-def suggest_for_reading(reading):
-    suggestions = []
-    lifestyle_tips = []
-
-    # Blood pressure
-    if reading.systolic is not None and reading.diastolic is not None:
-        s, d = reading.systolic, reading.diastolic
-        if s >= 180 or d >= 120:
-            suggestions.append("🚨 HYPERTENSIVE EMERGENCY: Seek immediate medical care!")
-            lifestyle_tips.extend([
-                "• Reduce sodium intake to <1,500mg/day",
-                "• Follow DASH diet (fruits, vegetables, whole grains)",
-                "• Engage in 30 minutes moderate exercise daily",
-                "• Practice stress management techniques",
-                "• Limit alcohol to 1 drink/day for women, 2 for men",
-                "• Maintain healthy weight (BMI 18.5-24.9)"
-            ])
-        elif s >= 140 or d >= 90:
-            suggestions.append("⚠️ HIGH BLOOD PRESSURE (Stage 2+): Consult doctor immediately")
-            lifestyle_tips.extend([
-                "• Reduce sodium intake to <2,300mg/day",
-                "• Increase potassium-rich foods (bananas, spinach, sweet potatoes)",
-                "• Exercise 150 minutes/week moderate intensity",
-                "• Practice meditation or deep breathing",
-                "• Limit processed foods and fast food",
-                "• Monitor blood pressure daily"
-            ])
-        elif 130 <= s < 140 or 80 <= d < 90:
-            suggestions.append("📈 ELEVATED BP (Stage 1): Lifestyle measures recommended")
-            lifestyle_tips.extend([
-                "• Reduce sodium gradually",
-                "• Increase physical activity",
-                "• Eat more fruits and vegetables",
-                "• Limit caffeine intake",
-                "• Get adequate sleep (7-9 hours)",
-                "• Consider mindfulness practices"
-            ])
-        elif s < 90 or d < 60:
-            suggestions.append("📉 LOW BP: Consider hydration or medical review")
-            lifestyle_tips.extend([
-                "• Increase fluid intake (8-10 glasses water/day)",
-                "• Add more salt to diet (if not contraindicated)",
-                "• Eat smaller, more frequent meals",
-                "• Avoid sudden position changes",
-                "• Consider compression stockings",
-                "• Monitor symptoms closely"
-            ])
-        else:
-            suggestions.append("✅ Blood pressure normal - maintain healthy lifestyle!")
-
-    # Glucose
-    if reading.glucose_mg_dl is not None:
-        g = reading.glucose_mg_dl
-        if g >= 300:
-            suggestions.append("🚨 VERY HIGH GLUCOSE: Urgent medical care needed!")
-            lifestyle_tips.extend([
-                "• Follow diabetic meal plan strictly",
-                "• Monitor blood glucose 4-6 times daily",
-                "• Stay hydrated with water",
-                "• Avoid sugary drinks and foods",
-                "• Take medications as prescribed",
-                "• Check for ketones if instructed"
-            ])
-        elif g >= 200:
-            suggestions.append("⚠️ HIGH GLUCOSE: Consult healthcare provider")
-            lifestyle_tips.extend([
-                "• Follow low-carb, high-fiber diet",
-                "• Exercise 30 minutes daily",
-                "• Monitor carbohydrate intake",
-                "• Stay well hydrated",
-                "• Check blood glucose regularly",
-                "• Consider medication adjustment"
-            ])
-        elif 140 <= g < 200:
-            suggestions.append("📈 IMPAIRED GLUCOSE TOLERANCE: Diet and exercise focus")
-            lifestyle_tips.extend([
-                "• Choose complex carbs over simple sugars",
-                "• Eat smaller portions more frequently",
-                "• Include protein with each meal",
-                "• Walk 10,000 steps daily",
-                "• Lose weight if overweight",
-                "• Limit processed foods"
-            ])
-        elif g < 70:
-            suggestions.append("📉 LOW BLOOD SUGAR: Consume fast-acting carbs")
-            lifestyle_tips.extend([
-                "• Eat 15g fast-acting carbs (glucose tablets, juice)",
-                "• Recheck glucose in 15 minutes",
-                "• Eat protein snack after correction",
-                "• Don't skip meals",
-                "• Carry emergency glucose source",
-                "• Monitor for symptoms"
-            ])
-        else:
-            suggestions.append("✅ Glucose in normal range - keep it up!")
-
-    # Temperature
-    if reading.temp_c is not None:
-        t = reading.temp_c
-        if t >= 40:
-            suggestions.append("🚨 VERY HIGH FEVER: Seek urgent medical attention!")
-            lifestyle_tips.extend([
-                "• Take fever-reducing medication as directed",
-                "• Stay hydrated with cool fluids",
-                "• Use cool compresses",
-                "• Rest in cool environment",
-                "• Monitor temperature every 2 hours",
-                "• Seek medical help if symptoms worsen"
-            ])
-        elif t >= 38:
-            suggestions.append("🌡️ FEVER: Rest and fluids recommended")
-            lifestyle_tips.extend([
-                "• Get plenty of rest",
-                "• Drink fluids frequently",
-                "• Use fever-reducing medication if needed",
-                "• Wear light clothing",
-                "• Stay in cool environment",
-                "• Monitor symptoms"
-            ])
-        elif t < 35:
-            suggestions.append("❄️ LOW BODY TEMPERATURE: Seek medical advice")
-            lifestyle_tips.extend([
-                "• Warm up gradually",
-                "• Drink warm fluids",
-                "• Wear warm clothing",
-                "• Avoid alcohol",
-                "• Seek shelter from cold",
-                "• Monitor temperature"
-            ])
-        else:
-            suggestions.append("✅ Temperature normal")
-
-    # SpO2
-    if reading.spo2 is not None:
-        s = reading.spo2
-        if s < 90:
-            suggestions.append("🚨 LOW OXYGEN SATURATION: Urgent care required!")
-            lifestyle_tips.extend([
-                "• Seek immediate medical attention",
-                "• Use supplemental oxygen if prescribed",
-                "• Sit upright to improve breathing",
-                "• Avoid smoking and secondhand smoke",
-                "• Practice deep breathing exercises",
-                "• Monitor symptoms closely"
-            ])
-        elif 90 <= s < 95:
-            suggestions.append("⚠️ BORDERLINE OXYGEN SATURATION: Monitor symptoms")
-            lifestyle_tips.extend([
-                "• Practice deep breathing exercises",
-                "• Avoid smoking",
-                "• Stay hydrated",
-                "• Monitor for shortness of breath",
-                "• Consider humidifier",
-                "• Consult healthcare provider"
-            ])
-        else:
-            suggestions.append("✅ Oxygen saturation normal")
-
-    return suggestions, lifestyle_tips
-
-# --- Streamlit UI ---
-st.set_page_config(page_title="Medical Tracker", layout="wide")
-st.title("Medical Tracker — Patient vitals & suggestions")
-
-# --- Sidebar: patient management ---
-st.sidebar.header("Patients")
-
-# Add patient form
-with st.sidebar.form("add_patient", clear_on_submit=True):
-    p_name = st.text_input("Name")
-    p_dob = st.text_input("DOB (optional, YYYY-MM-DD)")
-    p_sex = st.selectbox("Sex", ["", "Male", "Female", "Other"])
-    p_notes = st.text_area("Notes (optional)")
-    add_btn = st.form_submit_button("Add patient")
-
-if add_btn and p_name.strip():
-    try:
-        session = get_session()
-        newp = Patient(name=p_name.strip(), dob=p_dob.strip() or None, sex=p_sex or None, notes=p_notes or None)
-        session.add(newp)
-        session.commit()
-        session.close()
-        st.sidebar.success(f"Patient '{p_name}' added.")
-        st.session_state['refresh'] = True
-    except Exception as e:
-        st.sidebar.error(f"Error adding patient: {str(e)}")
-        if 'session' in locals():
-            session.close()
-
-# Select patient
-try:
-    session = get_session()
-    patients = session.query(Patient).order_by(Patient.name).all()
-    patient_options = {f"{p.name} (id:{p.id})": p.id for p in patients}
-    selected = st.sidebar.selectbox("Select patient", options=[""] + list(patient_options.keys()))
-    selected_patient = None
-    if selected:
-        pid = patient_options[selected]
-        selected_patient = session.query(Patient).get(pid)
-        st.sidebar.markdown(f"**Selected:** {selected_patient.name}")
-        if selected_patient.notes:
-            st.sidebar.write(selected_patient.notes)
-except Exception as e:
-    st.sidebar.error(f"Error loading patients: {str(e)}")
-    selected_patient = None
-finally:
-    if 'session' in locals():
-        session.close()
-
-
-# --- Delete patient option ---
-if selected_patient:
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("Delete Patient")
-
-    delete_confirm = st.sidebar.checkbox(
-        f"Confirm delete {selected_patient.name}",
-        key=f"del_{selected_patient.id}"
-    )
-
-    def delete_patient():
-        try:
-            session = get_session()
-            # Delete all readings for the patient
-            session.query(Reading).filter(Reading.patient_id == selected_patient.id).delete()
-            session.delete(selected_patient)
-            session.commit()
-            session.close()
-            st.sidebar.success(f"Deleted patient {selected_patient.name}")
-
-            # Reset reading form fields safely
-            st.session_state.systolic = 120
-            st.session_state.diastolic = 80
-            st.session_state.glucose = 90.0
-            st.session_state.temp_c = 36.6
-            st.session_state.spo2 = 98.0
-            st.session_state.notes = ""
-            st.session_state.date = datetime.today()
-            st.session_state.time = datetime.now().time()
-
-            # Rerun to refresh UI
-            st.session_state['refresh'] = True
-        except Exception as e:
-            st.sidebar.error(f"Error deleting patient: {str(e)}")
-            if 'session' in locals():
-                session.close()
-
-    if delete_confirm and st.sidebar.button("Delete patient", key=f"btn_del_{selected_patient.id}"):
-        delete_patient()
-
-
-# --- Main: input reading ---
-st.header("Record new reading")
-
-if selected_patient is None:
-    st.warning("Add and select a patient from the sidebar to record readings.")
-else:
-    # --- Callback to reset form fields ---
-    def reset_reading_fields():
-        st.session_state.systolic = 120
-        st.session_state.diastolic = 80
-        st.session_state.glucose = 90.0
-        st.session_state.temp_c = 36.6
-        st.session_state.spo2 = 98.0
-        st.session_state.notes = ""
-
-    # --- Reading form ---
-    with st.form("reading_form"):
-        date = st.date_input("Date", value=datetime.today(), key="date")
-        time = st.time_input("Time", value=datetime.now().time(), key="time")
-        timestamp = datetime.combine(date, time)
-
-        systolic = st.number_input(
-            "Systolic (mmHg)",
-            min_value=0,
-            max_value=300,
-            value=st.session_state.get("systolic", 120),
-            step=1,
-            key="systolic"
-        )
-        diastolic = st.number_input(
-            "Diastolic (mmHg)",
-            min_value=0,
-            max_value=200,
-            value=st.session_state.get("diastolic", 80),
-            step=1,
-            key="diastolic"
-        )
-        glucose = st.number_input(
-            "Glucose (mg/dL)",
-            min_value=0.0,
-            max_value=1000.0,
-            value=st.session_state.get("glucose", 90.0),
-            step=0.1,
-            format="%.1f",
-            key="glucose"
-        )
-        temp_c = st.number_input(
-            "Temp (°C)",
-            min_value=25.0,
-            max_value=45.0,
-            value=st.session_state.get("temp_c", 36.6),
-            step=0.1,
-            format="%.1f",
-            key="temp_c"
-        )
-        spo2 = st.number_input(
-            "SpO₂ (%)",
-            min_value=0.0,
-            max_value=100.0,
-            value=st.session_state.get("spo2", 98.0),
-            step=0.1,
-            format="%.1f",
-            key="spo2"
-        )
-        notes = st.text_area(
-            "Notes (optional)",
-            value=st.session_state.get("notes", ""),
-            key="notes"
-        )
-
-        save = st.form_submit_button("Save reading", on_click=reset_reading_fields)
-
-        if save:
-            try:
-                session = get_session()
-                r = Reading(
-                    patient_id=selected_patient.id,
-                    timestamp=timestamp,
-                    systolic=int(systolic) if systolic else None,
-                    diastolic=int(diastolic) if diastolic else None,
-                    glucose_mg_dl=float(glucose) if glucose is not None else None,
-                    temp_c=float(temp_c) if temp_c is not None else None,
-                    spo2=float(spo2) if spo2 is not None else None,
-                    notes=notes or None
-                )
-                session.add(r)
-                session.commit()
-                session.close()
-                st.success("Reading saved.")
-            except Exception as e:
-                st.error(f"Error saving reading: {str(e)}")
-                if 'session' in locals():
-                    session.close()
-
-
-# --- Display readings & suggestions ---
-if selected_patient:
-    st.header(f"History & suggestions — {selected_patient.name}")
-    try:
-        session = get_session()
-        dfq = session.query(Reading).filter(Reading.patient_id==selected_patient.id).order_by(Reading.timestamp.desc()).all()
-    except Exception as e:
-        st.error(f"Error loading readings: {str(e)}")
-        dfq = []
-        if 'session' in locals():
-            session.close()
-    
-    if not dfq:
-        st.info("No readings yet.")
-    else:
-        df = pd.DataFrame([{
-            "id": r.id,
-            "timestamp": r.timestamp,
-            "systolic": r.systolic,
-            "diastolic": r.diastolic,
-            "glucose_mg_dl": r.glucose_mg_dl,
-            "temp_c": r.temp_c,
-            "spo2": r.spo2,
-            "notes": r.notes
-        } for r in dfq])
-
-        st.dataframe(df[['timestamp','systolic','diastolic','glucose_mg_dl','temp_c','spo2','notes']])
-
-        # Suggestions for latest reading
-        latest = dfq[0]
-        suggestions, lifestyle_tips = suggest_for_reading(latest)
-        
-        st.subheader("🚨 Medical Assessment (Latest Reading)")
-        for s in suggestions:
-            st.write(s)
-        
-        if lifestyle_tips:
-            st.subheader("💡 Prevention & Lifestyle Tips")
-            for tip in lifestyle_tips:
-                st.write(tip)
-
-        # Charts
-        st.subheader("📊 Trend Charts")
-        chart_cols = st.columns(2)
-
-        with chart_cols[0]:
-            st.write("**Blood Pressure Trends (Last 30 Readings)**")
-            bp_df = pd.DataFrame([{"timestamp": r.timestamp, "systolic": r.systolic, "diastolic": r.diastolic} for r in dfq])
-            bp_df = bp_df.dropna().sort_values("timestamp").tail(30)
-            
-            if not bp_df.empty:
-                fig, ax = plt.subplots(figsize=(8, 4))
-                ax.plot(bp_df['timestamp'], bp_df['systolic'], 'b-o', label='Systolic', linewidth=2, markersize=4)
-                ax.plot(bp_df['timestamp'], bp_df['diastolic'], 'r-o', label='Diastolic', linewidth=2, markersize=4)
-                ax.set_ylabel("Blood Pressure (mmHg)", fontsize=12)
-                ax.set_xlabel("Date", fontsize=12)
-                ax.legend(fontsize=10)
-                ax.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                fig.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
-            else:
-                st.info("No blood pressure data available for charting")
-
-        with chart_cols[1]:
-            st.write("**Glucose & SpO2 Trends (Last 30 Readings)**")
-            glucose_spo2_df = pd.DataFrame([{"timestamp": r.timestamp, "glucose": r.glucose_mg_dl, "spo2": r.spo2} for r in dfq])
-            glucose_spo2_df = glucose_spo2_df.sort_values("timestamp").tail(30)
-            
-            if not glucose_spo2_df.empty:
-                fig, ax1 = plt.subplots(figsize=(8, 4))
-                
-                # Plot glucose if available
-                glucose_data = glucose_spo2_df.dropna(subset=['glucose'])
-                if not glucose_data.empty:
-                    ax1.plot(glucose_data['timestamp'], glucose_data['glucose'], 'b-o', color='tab:blue', label='Glucose', linewidth=2, markersize=4)
-                    ax1.set_ylabel("Glucose (mg/dL)", color='tab:blue', fontsize=12)
-                    ax1.tick_params(axis='y', labelcolor='tab:blue')
-                
-                # Plot SpO2 if available
-                spo2_data = glucose_spo2_df.dropna(subset=['spo2'])
-                if not spo2_data.empty:
-                    ax2 = ax1.twinx()
-                    ax2.plot(spo2_data['timestamp'], spo2_data['spo2'], 'r-o', color='tab:red', label='SpO2', linewidth=2, markersize=4)
-                    ax2.set_ylabel("SpO2 (%)", color='tab:red', fontsize=12)
-                    ax2.tick_params(axis='y', labelcolor='tab:red')
-                
-                ax1.set_xlabel("Date", fontsize=12)
-                ax1.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                fig.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
-            else:
-                st.info("No glucose or SpO2 data available for charting")
-
-
-        # Export CSV
-        csv = df.to_csv(index=False)
-        st.download_button("Download history CSV", data=csv, file_name=f"{selected_patient.name}_history.csv", mime="text/csv")
-
-        # Delete a reading
-        st.subheader("Manage readings")
-        ids = [r.id for r in dfq]
-        del_id = st.selectbox("Select reading id to delete", options=[""] + [str(i) for i in ids])
-        if st.button("Delete reading"):
-            if del_id:
-                try:
-                    session = get_session()
-                    to_del = session.query(Reading).get(int(del_id))
-                    if to_del:
-                        session.delete(to_del)
-                        session.commit()
-                        session.close()
-                        st.success("Deleted reading.")
-                        st.rerun()
-                except Exception as e:
-                    st.error(f"Error deleting reading: {str(e)}")
-                    if 'session' in locals():
-                        session.close()
-
-st.markdown("---")
-st.caption("This app provides educational suggestions only. Not a substitute for professional medical advice.")
+# app.py
+import io
+import os
+import streamlit as st
+from datetime import datetime, timedelta
+from db import engine, session_scope, init_db, lock_reading_inserts, Patient, Reading, READING_RANGES
+from queries import get_patient, readings_frame, page_cursor, as_reading, trend_frame, latest_readings_frame
+from cache import QueryCache, ALL_PATIENTS
+from suggestions import suggest_for_reading, classify_readings, alert_levels
+from rules import registry as rule_registry, ALERT_LEVELS
+from partitions import ensure_month_partitions
+from rollups import reading_stats, add_to_daily_stats, refresh_daily_stats, summary_stats
+from perf import recorder as perf_recorder, section
+from alerts import AlertEvaluator, ALERT_FEED_COLUMNS, alerts_frame, open_alert_count, acknowledge_alerts
+from search import search_patients, PATIENT_SEARCH_LIMIT
+from retention import history_with_archive, delete_patient_data, remove_patient_archive
+
+if 'refresh' not in st.session_state:
+    st.session_state['refresh'] = False
+
+# Check the flag and rerun safely
+if st.session_state['refresh']:
+    st.session_state['refresh'] = False
+    st.rerun()
+
+
+# --- Database setup ---
+# Once per server process, not on every rerun of every session. Modules only
+# some sections need (charts/matplotlib, importer, exporter) are imported
+# where those sections run; `python benchmarks/bench_startup.py` tracks the cost.
+@st.cache_resource
+def setup_database():
+    init_db()
+
+setup_database()
+
+# --- Performance instrumentation ---
+# Section and query timings are always recorded; PERF_PANEL=1 shows them in
+# the sidebar, PERF_LOG=<file> appends each rerun's breakdown as JSON
+PERF_PANEL = os.environ.get("PERF_PANEL", "0") == "1"
+
+@st.cache_resource
+def setup_instrumentation():
+    perf_recorder.instrument(engine)
+
+setup_instrumentation()
+perf_recorder.start_run()
+
+def finish_perf_run():
+    """End this rerun's timing and, with PERF_PANEL, show its breakdown"""
+    run = perf_recorder.finish_run()
+    if not PERF_PANEL or run is None:
+        return
+    with st.sidebar.expander("⏱ Performance", expanded=True):
+        st.caption(
+            f"This rerun: {run['total_ms']:.0f} ms ({run['untimed_ms']:.0f} ms outside sections) · "
+            f"{run['queries']} queries ({run['query_ms']:.1f} ms)"
+        )
+        st.dataframe(
+            [{"section": name, "ms": round(ms, 1)} for name, ms in sorted(run["sections"].items(), key=lambda kv: -kv[1])],
+            hide_index=True
+        )
+        snapshot = perf_recorder.snapshot()
+        st.caption(f"Slowest queries since start ({snapshot['runs']['count']} reruns)")
+        st.dataframe(
+            [{"ms": round(q["ms"], 2), "section": q["section"], "statement": q["statement"]} for q in snapshot["slowest_queries"]],
+            hide_index=True
+        )
+        st.download_button("Metrics (Prometheus)", data=perf_recorder.prometheus_text(), file_name="metrics.prom", mime="text/plain")
+
+# Rows shown per page of the history table
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "50"))
+HISTORY_PAGE_SIZES = sorted({25, 50, 100, 200, HISTORY_PAGE_SIZE})
+
+# Time windows for the trend charts; readings are aggregated into at most
+# CHART_BUCKETS time buckets (about one per two pixels of chart width)
+CHART_WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "90d": timedelta(days=90),
+    "1y": timedelta(days=365),
+}
+CHART_BUCKETS = 400
+
+# Summary windows (days ending at the latest reading), read from patient_daily_stats
+SUMMARY_WINDOWS = [7, 30, 90]
+VITAL_LABELS = {
+    "systolic": "Systolic (mmHg)",
+    "diastolic": "Diastolic (mmHg)",
+    "glucose_mg_dl": "Glucose (mg/dL)",
+    "temp_c": "Temp (°C)",
+    "spo2": "SpO₂ (%)",
+}
+
+DISCLAIMER = "This app provides educational suggestions only. Not a substitute for professional medical advice."
+
+# --- Query cache (shared by all sessions, invalidated on writes) ---
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "256"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "60"))
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL or None)
+
+query_cache = get_query_cache()
+
+def cached_query(name, patient_id, args, load):
+    """Run load(session) through the query cache, timed as section `name`"""
+    def loader():
+        with session_scope() as session:
+            return load(session)
+    with section(name):
+        return query_cache.get_or_load(name, patient_id, args, loader)
+
+def chart_image(render, patient_id, window, data):
+    """PNG of render(data), cached per patient data version and chart window:
+    reruns that don't change the data reuse the image instead of redrawing it"""
+    with section("charts"):
+        return query_cache.get_or_load(f"chart:{render.__name__}", patient_id, (window,), lambda: render(data))
+
+# --- Alert evaluator (one background thread per server process) ---
+# Set ALERT_EVALUATOR=0 when `python alerts.py run` evaluates readings instead
+ALERT_EVALUATOR = os.environ.get("ALERT_EVALUATOR", "1") != "0"
+
+@st.cache_resource
+def get_alert_evaluator():
+    return AlertEvaluator().start() if ALERT_EVALUATOR else None
+
+alert_evaluator = get_alert_evaluator()
+
+# --- Streamlit UI ---
+st.set_page_config(page_title="Medical Tracker", layout="wide")
+st.title("Medical Tracker — Patient vitals & suggestions")
+
+# --- Sidebar: patient management ---
+view = st.sidebar.radio("View", options=["Patient", "Ward overview", "Alerts"], horizontal=True, key="view")
+try:
+    with session_scope() as session:
+        st.sidebar.caption(f"🔔 {open_alert_count(session)} open alerts")
+except Exception as e:
+    st.sidebar.error(f"Error loading alerts: {str(e)}")
+
+# Rule set for suggestions and alerts; edited rule files are picked up on the next rerun
+try:
+    rule_registry.reload_if_changed()
+except Exception as e:
+    st.sidebar.error(f"Error reloading rule sets: {str(e)}")
+rule_names = rule_registry.names()
+# A rule set whose file was removed or renamed falls back to the default
+if st.session_state.get("rule_set", rule_registry.default) not in rule_names:
+    st.sidebar.warning(f"Rule set {st.session_state['rule_set']} is no longer available; using {rule_registry.default}.")
+    st.session_state["rule_set"] = rule_registry.default
+rule_set = st.sidebar.selectbox(
+    "Rule set", options=rule_names, index=rule_names.index(rule_registry.default), key="rule_set",
+    help=rule_registry.get(st.session_state.get("rule_set")).description
+)
+st.sidebar.header("Patients")
+
+# Add patient form
+with st.sidebar.form("add_patient", clear_on_submit=True):
+    p_name = st.text_input("Name")
+    p_dob = st.text_input("DOB (optional, YYYY-MM-DD)")
+    p_sex = st.selectbox("Sex", ["", "Male", "Female", "Other"])
+    p_notes = st.text_area("Notes (optional)")
+    add_btn = st.form_submit_button("Add patient")
+
+if add_btn and p_name.strip():
+    try:
+        with session_scope() as session:
+            newp = Patient(name=p_name.strip(), dob=p_dob.strip() or None, sex=p_sex or None, notes=p_notes or None)
+            session.add(newp)
+        query_cache.bump()
+        st.sidebar.success(f"Patient '{p_name}' added.")
+        st.session_state['refresh'] = True
+    except Exception as e:
+        st.sidebar.error(f"Error adding patient: {str(e)}")
+
+# Select patient: searched in SQL, so the selectbox holds at most PATIENT_SEARCH_LIMIT patients
+try:
+    search_text = st.sidebar.text_input("Search patients", placeholder="Name, or words from notes", key="patient_search")
+    matches = dict(cached_query(
+        "patient_search", None, (search_text, PATIENT_SEARCH_LIMIT),
+        lambda session: search_patients(session, search_text)
+    ))
+    if len(matches) == PATIENT_SEARCH_LIMIT:
+        st.sidebar.caption(f"First {PATIENT_SEARCH_LIMIT} matches — type more to narrow the search.")
+    # The selected patient stays selectable when the search no longer matches them
+    current = st.session_state.get("patient_id")
+    if current is not None and current not in matches:
+        current_patient = cached_query("patient", current, (), lambda session: get_patient(session, current))
+        if current_patient is None:
+            st.session_state["patient_id"] = None
+        else:
+            matches = {current: current_patient.name, **matches}
+    pid = st.sidebar.selectbox(
+        "Select patient", options=[None] + list(matches),
+        format_func=lambda pid: "" if pid is None else f"{matches[pid]} (id:{pid})", key="patient_id"
+    )
+    selected_patient = None
+    if pid is not None:
+        selected_patient = cached_query("patient", pid, (), lambda session: get_patient(session, pid))
+        st.sidebar.markdown(f"**Selected:** {selected_patient.name}")
+        if selected_patient.notes:
+            st.sidebar.write(selected_patient.notes)
+except Exception as e:
+    st.sidebar.error(f"Error loading patients: {str(e)}")
+    selected_patient = None
+
+
+# --- Delete patient option ---
+if selected_patient:
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Delete Patient")
+
+    delete_confirm = st.sidebar.checkbox(
+        f"Confirm delete {selected_patient.name}",
+        key=f"del_{selected_patient.id}"
+    )
+
+    def delete_patient():
+        try:
+            with session_scope() as session:
+                delete_patient_data(session, selected_patient.id)
+            remove_patient_archive(selected_patient.id)
+            query_cache.bump()
+            query_cache.bump(selected_patient.id)
+            st.sidebar.success(f"Deleted patient {selected_patient.name}")
+
+            # Reset reading form fields safely
+            st.session_state.systolic = 120
+            st.session_state.diastolic = 80
+            st.session_state.glucose = 90.0
+            st.session_state.temp_c = 36.6
+            st.session_state.spo2 = 98.0
+            st.session_state.notes = ""
+            st.session_state.date = datetime.utcnow().date()
+            st.session_state.time = datetime.utcnow().time()
+
+            # Rerun to refresh UI
+            st.session_state['refresh'] = True
+        except Exception as e:
+            st.sidebar.error(f"Error deleting patient: {str(e)}")
+
+    if delete_confirm and st.sidebar.button("Delete patient", key=f"btn_del_{selected_patient.id}"):
+        delete_patient()
+
+
+# --- Bulk import ---
+st.sidebar.markdown("---")
+st.sidebar.subheader("Bulk Import Readings")
+
+with st.sidebar.form("bulk_import", clear_on_submit=True):
+    import_file = st.file_uploader("CSV or JSONL export", type=["csv", "jsonl", "ndjson"])
+    st.caption("Rows without a patient_id are added to the selected patient.")
+    import_btn = st.form_submit_button("Import readings")
+
+if import_btn and import_file is not None:
+    rejects = io.StringIO()
+    try:
+        from importer import import_readings, detect_format
+        with section("import"):
+            result = import_readings(
+                import_file,
+                fmt=detect_format(import_file.name),
+                patient_id=selected_patient.id if selected_patient else None,
+                rejects=rejects
+            )
+        for pid in result["patient_ids"]:
+            query_cache.bump(pid)
+        st.sidebar.success(f"Imported {result['inserted']} readings.")
+        if result["rejected"]:
+            st.sidebar.warning(f"Rejected {result['rejected']} rows.")
+            st.sidebar.download_button("Download reject report", data=rejects.getvalue(), file_name="rejects.csv", mime="text/csv")
+    except Exception as e:
+        st.sidebar.error(f"Error importing readings: {str(e)}")
+
+
+# --- Ward overview: every patient's latest reading ---
+def format_age(age):
+    """Compact 'time since' for a timedelta, e.g. '2d 3h' or '45m'"""
+    if age != age:  # NaT: patient has no readings
+        return ""
+    minutes = int(age.total_seconds() // 60)
+    if minutes < 0:
+        return "in future"
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+if view == "Ward overview":
+    st.header("Ward overview — latest reading per patient")
+    try:
+        ward = cached_query("ward", ALL_PATIENTS, (), latest_readings_frame)
+    except Exception as e:
+        st.error(f"Error loading ward overview: {str(e)}")
+        ward = None
+
+    if ward is not None and ward.empty:
+        st.info("No patients yet.")
+    elif ward is not None:
+        age = datetime.utcnow() - ward["timestamp"]
+        overview = ward[["patient_id", "name", "timestamp", "systolic", "diastolic", "glucose_mg_dl", "temp_c", "spo2"]].assign(
+            alert=alert_levels(classify_readings(ward, rule_set), rule_set),
+            since=[format_age(a) for a in age],
+            age=age
+        )
+
+        level_cols = st.columns(len(ALERT_LEVELS) + 1)
+        for col, level in zip(level_cols, reversed(ALERT_LEVELS)):
+            col.metric(level.title(), int((overview["alert"] == level).sum()))
+        level_cols[-1].metric("No readings", int(overview["timestamp"].isna().sum()))
+
+        show_levels = st.multiselect("Alert levels", options=list(reversed(ALERT_LEVELS)), default=["urgent", "warning"])
+        if show_levels:
+            overview = overview[overview["alert"].isin(show_levels)]
+        overview = overview.sort_values(["alert", "age"], ascending=[False, False], na_position="last")
+        st.dataframe(overview.drop(columns=["age"]), hide_index=True)
+
+    st.markdown("---")
+    st.caption(DISCLAIMER)
+    finish_perf_run()
+    st.stop()
+
+
+# --- Alerts feed ---
+if view == "Alerts":
+    st.header("Alerts")
+    if alert_evaluator is not None and alert_evaluator.last_error:
+        st.error(f"Error evaluating alerts: {alert_evaluator.last_error}")
+    show_acknowledged = st.checkbox("Show acknowledged", key="alerts_acknowledged")
+    try:
+        with session_scope() as session:
+            feed = alerts_frame(session, include_acknowledged=show_acknowledged)
+    except Exception as e:
+        st.error(f"Error loading alerts: {str(e)}")
+        feed = None
+
+    if feed is not None and feed.empty:
+        st.info("No open alerts.")
+    elif feed is not None:
+        edited = st.data_editor(
+            feed.assign(acknowledge=False),
+            column_order=["acknowledge", "created_at", "patient", "level", "message", "reading_timestamp", "acknowledged_at"],
+            disabled=ALERT_FEED_COLUMNS, hide_index=True, key="alerts_editor"
+        )
+        if st.button("Acknowledge selected"):
+            try:
+                with session_scope() as session:
+                    acknowledged = acknowledge_alerts(session, edited.loc[edited["acknowledge"], "id"].tolist())
+                st.success(f"Acknowledged {acknowledged} alerts.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error acknowledging alerts: {str(e)}")
+
+    st.markdown("---")
+    st.caption(DISCLAIMER)
+    finish_perf_run()
+    st.stop()
+
+
+# --- Main: input reading ---
+st.header("Record new reading")
+
+if selected_patient is None:
+    st.warning("Add and select a patient from the sidebar to record readings.")
+else:
+    # --- Callback to reset form fields ---
+    def reset_reading_fields():
+        st.session_state.systolic = 120
+        st.session_state.diastolic = 80
+        st.session_state.glucose = 90.0
+        st.session_state.temp_c = 36.6
+        st.session_state.spo2 = 98.0
+        st.session_state.notes = ""
+
+    # --- Reading form ---
+    with st.form("reading_form"):
+        # Timestamps are stored and shown as UTC, like device and imported readings
+        date = st.date_input("Date (UTC)", value=datetime.utcnow().date(), key="date")
+        time = st.time_input("Time (UTC)", value=datetime.utcnow().time(), key="time")
+        timestamp = datetime.combine(date, time)
+
+        systolic = st.number_input(
+            "Systolic (mmHg)",
+            min_value=READING_RANGES["systolic"][0],
+            max_value=READING_RANGES["systolic"][1],
+            value=st.session_state.get("systolic", 120),
+            step=1,
+            key="systolic"
+        )
+        diastolic = st.number_input(
+            "Diastolic (mmHg)",
+            min_value=READING_RANGES["diastolic"][0],
+            max_value=READING_RANGES["diastolic"][1],
+            value=st.session_state.get("diastolic", 80),
+            step=1,
+            key="diastolic"
+        )
+        glucose = st.number_input(
+            "Glucose (mg/dL)",
+            min_value=READING_RANGES["glucose_mg_dl"][0],
+            max_value=READING_RANGES["glucose_mg_dl"][1],
+            value=st.session_state.get("glucose", 90.0),
+            step=0.1,
+            format="%.1f",
+            key="glucose"
+        )
+        temp_c = st.number_input(
+            "Temp (°C)",
+            min_value=READING_RANGES["temp_c"][0],
+            max_value=READING_RANGES["temp_c"][1],
+            value=st.session_state.get("temp_c", 36.6),
+            step=0.1,
+            format="%.1f",
+            key="temp_c"
+        )
+        spo2 = st.number_input(
+            "SpO₂ (%)",
+            min_value=READING_RANGES["spo2"][0],
+            max_value=READING_RANGES["spo2"][1],
+            value=st.session_state.get("spo2", 98.0),
+            step=0.1,
+            format="%.1f",
+            key="spo2"
+        )
+        notes = st.text_area(
+            "Notes (optional)",
+            value=st.session_state.get("notes", ""),
+            key="notes"
+        )
+
+        save = st.form_submit_button("Save reading", on_click=reset_reading_fields)
+
+        if save:
+            try:
+                r = Reading(
+                    patient_id=selected_patient.id,
+                    timestamp=timestamp,
+                    systolic=int(systolic) if systolic else None,
+                    diastolic=int(diastolic) if diastolic else None,
+                    glucose_mg_dl=float(glucose) if glucose is not None else None,
+                    temp_c=float(temp_c) if temp_c is not None else None,
+                    spo2=float(spo2) if spo2 is not None else None,
+                    notes=notes or None
+                )
+                # Rollup delta computed before the transaction takes the write lock
+                stats = reading_stats([r])
+                with section("save reading"), session_scope() as session:
+                    ensure_month_partitions(session.connection(), timestamp, timestamp)
+                    lock_reading_inserts(session.connection())
+                    session.add(r)
+                    session.flush()
+                    add_to_daily_stats(session.connection(), stats)
+                query_cache.bump(selected_patient.id)
+                if alert_evaluator is not None:
+                    alert_evaluator.wake()
+                st.success("Reading saved.")
+            except Exception as e:
+                st.error(f"Error saving reading: {str(e)}")
+
+
+# --- Display readings & suggestions ---
+if selected_patient:
+    st.header(f"History & suggestions — {selected_patient.name}")
+    try:
+        with session_scope() as session:
+            patient_alerts = alerts_frame(session, patient_id=selected_patient.id, limit=20)
+        if not patient_alerts.empty:
+            with st.expander(f"🔔 {len(patient_alerts)} open alerts", expanded=True):
+                for _, a in patient_alerts.iterrows():
+                    st.markdown(f"**{a['level'].upper()}** · {a['reading_timestamp']:%Y-%m-%d %H:%M} — {a['message']}")
+    except Exception as e:
+        st.error(f"Error loading alerts: {str(e)}")
+    # Keyset cursors for the history table: the (timestamp, id) each visited page starts after
+    cursor_key = f"history_cursors_{selected_patient.id}"
+    if cursor_key not in st.session_state:
+        st.session_state[cursor_key] = [None]
+    cursors = st.session_state[cursor_key]
+    page_size = st.selectbox(
+        "Rows per page",
+        options=HISTORY_PAGE_SIZES,
+        index=HISTORY_PAGE_SIZES.index(HISTORY_PAGE_SIZE),
+        key="history_page_size"
+    )
+
+    # History filters, run in SQL with the page's LIMIT
+    with st.expander("Filter readings"):
+        filter_cols = st.columns(4)
+        with filter_cols[0]:
+            filter_start = st.date_input("From", value=None, key="history_start")
+        with filter_cols[1]:
+            filter_end = st.date_input("To", value=None, key="history_end")
+        with filter_cols[2]:
+            filter_vitals = st.multiselect(
+                "Outside the normal range", options=list(VITAL_LABELS), format_func=VITAL_LABELS.get,
+                key="history_out_of_range", help="Normal bands of the selected rule set"
+            )
+        with filter_cols[3]:
+            filter_text = st.text_input("Notes contain", key="history_notes")
+    normal_ranges = rule_registry.get(rule_set).normal_ranges()
+    history_filter = (
+        datetime.combine(filter_start, datetime.min.time()) if filter_start else None,
+        datetime.combine(filter_end, datetime.min.time()) + timedelta(days=1) if filter_end else None,
+        tuple((vital, *normal_ranges[vital]) for vital in filter_vitals if vital in normal_ranges),
+        filter_text.strip() or None,
+    )
+    filtered = history_filter != (None, None, (), None)
+    # Changed filters start again from the newest matching readings
+    filter_key = f"history_filter_{selected_patient.id}"
+    if st.session_state.get(filter_key, history_filter) != history_filter:
+        cursors[:] = [None]
+    st.session_state[filter_key] = history_filter
+
+    try:
+        pid = selected_patient.id
+        df, has_more = cached_query(
+            "history", pid, (page_size, cursors[-1], history_filter),
+            lambda session: history_with_archive(session, pid, page_size, before=cursors[-1], filters=history_filter)
+        )
+        # The first unfiltered page already holds the newest readings the charts need
+        if len(cursors) == 1 and page_size >= 30 and not filtered:
+            recent = df
+        else:
+            recent = cached_query("recent", pid, (30,), lambda session: readings_frame(session, pid, limit=30))
+    except Exception as e:
+        st.error(f"Error loading readings: {str(e)}")
+        df = recent = None
+
+    # The page we were on was emptied by deletes: start again from the newest readings
+    if recent is not None and not recent.empty and df.empty and len(cursors) > 1:
+        cursors[:] = [None]
+        st.rerun()
+
+    if recent is None or recent.empty:
+        st.info("No readings yet.")
+    else:
+        with section("classify"):
+            categories = classify_readings(df, rule_set)
+        if filtered and df.empty:
+            st.info("No readings match the filters.")
+        # Readings older than the retention period come from the archive (read-only)
+        history_columns = ['timestamp','systolic','diastolic','glucose_mg_dl','temp_c','spo2','notes'] + (['archived'] if df["archived"].any() else [])
+        st.dataframe(df[history_columns].join(categories))
+
+        nav_cols = st.columns(3)
+        with nav_cols[0]:
+            if st.button("← Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with nav_cols[1]:
+            st.caption(f"Page {len(cursors)}")
+        with nav_cols[2]:
+            if st.button("Older →", disabled=not has_more):
+                cursors.append(page_cursor(df))
+                st.rerun()
+
+        # Suggestions for latest reading
+        with section("suggestions"):
+            suggestions, lifestyle_tips = suggest_for_reading(as_reading(recent.iloc[0]), rule_set)
+        
+        st.subheader("🚨 Medical Assessment (Latest Reading)")
+        for s in suggestions:
+            st.write(s)
+        
+        if lifestyle_tips:
+            st.subheader("💡 Prevention & Lifestyle Tips")
+            for tip in lifestyle_tips:
+                st.write(tip)
+
+        # Summary statistics from the daily rollups
+        st.subheader("📋 Summary")
+        as_of = recent.iloc[0]["timestamp"].date()
+        summary_tabs = st.tabs([f"Last {days} days" for days in SUMMARY_WINDOWS])
+        for tab, days in zip(summary_tabs, SUMMARY_WINDOWS):
+            with tab:
+                summary = cached_query(
+                    "summary", pid, (as_of, days),
+                    lambda session: summary_stats(session, pid, as_of, days)
+                )
+                if summary.empty:
+                    st.info("No readings in this period")
+                else:
+                    st.dataframe(
+                        summary.rename(index=VITAL_LABELS).rename(columns={
+                            "n": "Readings", "mean": "Average", "min": "Min", "max": "Max", "abnormal": "Abnormal"
+                        }).round(1)
+                    )
+                    st.caption(f"Abnormal: outside the normal range of the {rule_registry.default} rule set")
+
+        # Charts
+        st.subheader("📊 Trend Charts")
+        chart_window = st.radio(
+            "Chart window",
+            options=["Last 30 readings"] + list(CHART_WINDOWS),
+            horizontal=True,
+            key="chart_window"
+        )
+        chart_cols = st.columns(2)
+        from charts import bp_chart, glucose_spo2_chart, bp_trend_chart, glucose_spo2_trend_chart
+
+        if chart_window == "Last 30 readings":
+            chart_data = recent.sort_values("timestamp").tail(30)
+            charts = [
+                ("Blood Pressure Trends (Last 30 Readings)", bp_chart, "No blood pressure data available for charting"),
+                ("Glucose & SpO2 Trends (Last 30 Readings)", glucose_spo2_chart, "No glucose or SpO2 data available for charting"),
+            ]
+        else:
+            # Window ends at the latest reading; min/mean/max per bucket come from SQL
+            end = recent.iloc[0]["timestamp"].to_pydatetime()
+            start = end - CHART_WINDOWS[chart_window]
+            chart_data = cached_query(
+                "trend", pid, (chart_window, end),
+                lambda session: trend_frame(session, pid, start, end, buckets=CHART_BUCKETS)
+            )
+            charts = [
+                (f"Blood Pressure Trends (Last {chart_window}, min–max band)", bp_trend_chart, "No blood pressure data in this window"),
+                (f"Glucose & SpO2 Trends (Last {chart_window}, min–max band)", glucose_spo2_trend_chart, "No glucose or SpO2 data in this window"),
+            ]
+
+        for col, (title, render, empty_message) in zip(chart_cols, charts):
+            with col:
+                st.write(f"**{title}**")
+                try:
+                    png = chart_image(render, pid, chart_window, chart_data)
+                except Exception as e:
+                    st.error(f"Error drawing chart: {str(e)}")
+                    continue
+                if png is not None:
+                    st.image(png)
+                else:
+                    st.info(empty_message)
+
+
+        # Export (streamed from the database to a temp file on request)
+        st.subheader("Export history")
+        from exporter import export_to_tempfile, EXPORT_FORMATS
+        export_cols = st.columns(4)
+        with export_cols[0]:
+            export_format = st.radio("Format", options=list(EXPORT_FORMATS), format_func=str.upper, key="export_format")
+        with export_cols[1]:
+            export_scope = st.radio("Patients", options=["This patient", "All patients"], key="export_scope")
+        with export_cols[2]:
+            export_start = st.date_input("From (optional)", value=None, key="export_start")
+        with export_cols[3]:
+            export_end = st.date_input("To (optional)", value=None, key="export_end")
+
+        # The file is exported in chunks, but Streamlit serves a download from memory
+        st.caption("In-app downloads are held in memory while served; export large histories with `python exporter.py`.")
+        if st.button("Prepare export"):
+            try:
+                with section("export"):
+                    export_path = export_to_tempfile(
+                        export_format,
+                        patient_ids=[selected_patient.id] if export_scope == "This patient" else None,
+                        start=datetime.combine(export_start, datetime.min.time()) if export_start else None,
+                        end=datetime.combine(export_end, datetime.min.time()) + timedelta(days=1) if export_end else None
+                    )
+                try:
+                    mime, suffix = EXPORT_FORMATS[export_format]
+                    name = selected_patient.name if export_scope == "This patient" else "all_patients"
+                    with open(export_path, "rb") as f:
+                        st.download_button(f"Download {export_format.upper()}", data=f, file_name=f"{name}_history{suffix}", mime=mime)
+                finally:
+                    os.remove(export_path)
+            except Exception as e:
+                st.error(f"Error exporting readings: {str(e)}")
+
+        # Delete a reading
+        st.subheader("Manage readings")
+        ids = df.loc[~df["archived"], "id"].tolist()
+        del_id = st.selectbox("Select reading id to delete", options=[""] + [str(i) for i in ids])
+        if st.button("Delete reading"):
+            if del_id:
+                deleted = False
+                try:
+                    with session_scope() as session:
+                        to_del = session.get(Reading, int(del_id))
+                        if to_del:
+                            day = to_del.timestamp.date()
+                            session.delete(to_del)
+                            session.flush()
+                            refresh_daily_stats(session.connection(), [selected_patient.id], day, day)
+                            deleted = True
+                except Exception as e:
+                    st.error(f"Error deleting reading: {str(e)}")
+                if deleted:
+                    query_cache.bump(selected_patient.id)
+                    st.success("Deleted reading.")
+                    st.rerun()
+
+# --- Query cache stats ---
+cache_stats = query_cache.stats()
+st.sidebar.markdown("---")
+st.sidebar.caption(
+    f"Query cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+    f"{cache_stats['size']}/{cache_stats['maxsize']} entries"
+)
+
+st.markdown("---")
+st.caption(DISCLAIMER)
+finish_perf_run()
@@ -0,0 +1,113 @@
+# benchmarks/bench_alerts.py
+"""Cost of evaluating new readings for alerts as patient history grows.
+
+    python benchmarks/bench_alerts.py --history 0 1000 20000 --new 2000
+
+For each history size a temporary SQLite database is seeded with about
+that many synthetic readings (synthetic.py, one every 10 minutes) for each
+of --patients patients, ending a day ago; the evaluator cursor is
+started at the newest of them, then --new recent readings are inserted and
+evaluated. Per-reading cost should not depend on the history size. Finally
+two evaluators race over the same new readings to check each is evaluated
+once.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import AlertProgress, Reading, create_db_engine, init_db  # noqa: E402
+from alerts import AlertCursorMoved, process_batch  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+PER_DAY = 144  # history readings a day
+
+
+def seed(engine, patients, history):
+    """Patients with about `history` old readings each; returns their ids"""
+    patient_ids = generate(engine, patients=patients, days=history / PER_DAY, per_day=PER_DAY,
+                           end=datetime.utcnow() - timedelta(days=1), gap_rate=0)["patient_ids"]
+    process_batch(engine)  # starts the cursor at the newest reading
+    return patient_ids
+
+
+def add_new(engine, patient_ids, count, seed_value=0):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow() - timedelta(hours=12)
+    with engine.begin() as conn:
+        conn.execute(Reading.__table__.insert(), [
+            {"patient_id": rng.choice(patient_ids), "timestamp": now + timedelta(seconds=20 * k),
+             "systolic": rng.randint(95, 190), "diastolic": rng.randint(55, 125), "spo2": round(rng.uniform(86, 100), 1)}
+            for k in range(count)
+        ])
+
+
+def drain(engine, batch_size, counts):
+    while True:
+        try:
+            evaluated, raised = process_batch(engine, limit=batch_size)
+        except AlertCursorMoved:
+            counts["conflicts"] += 1
+            continue
+        counts["evaluated"] += evaluated
+        counts["raised"] += raised
+        if evaluated == 0:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 1000, 20000], help="about this many old readings per patient")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--new", type=int, default=2000, help="new readings to evaluate")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for history in args.history:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, f'alerts_{history}.db')}")
+            init_db(bind=engine)
+            patient_ids = seed(engine, args.patients, history)
+            add_new(engine, patient_ids, args.new)
+            counts = {"evaluated": 0, "raised": 0, "conflicts": 0}
+            t0 = time.perf_counter()
+            drain(engine, args.batch_size, counts)
+            elapsed = time.perf_counter() - t0
+            print(f"history {history:>7,}/patient: {counts['evaluated']} new readings in {elapsed:.3f}s "
+                  f"({elapsed / max(counts['evaluated'], 1) * 1e6:.0f} µs/reading), {counts['raised']} alerts")
+            ok &= counts["evaluated"] == args.new
+            engine.dispose()
+
+        # Two evaluators racing over the same readings
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'race.db')}")
+        init_db(bind=engine)
+        patient_ids = seed(engine, args.patients, 0)
+        add_new(engine, patient_ids, args.new, seed_value=1)
+        counts = {"evaluated": 0, "raised": 0, "conflicts": 0}
+        threads = [threading.Thread(target=drain, args=(engine, args.batch_size, counts)) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with engine.connect() as conn:
+            cursor = conn.execute(AlertProgress.__table__.select()).first().last_reading_id
+            newest = conn.exec_driver_sql("SELECT max(id) FROM readings").scalar()
+            stored = conn.exec_driver_sql("SELECT count(*) FROM alerts").scalar()
+            repeated = conn.exec_driver_sql(
+                "SELECT count(*) FROM (SELECT reading_id, rule FROM alerts GROUP BY reading_id, rule HAVING count(*) > 1)"
+            ).scalar()
+        engine.dispose()
+        print(f"race: {counts['evaluated']} evaluated by 2 evaluators ({counts['conflicts']} lost races), "
+              f"{stored} alerts stored, {repeated} repeated, cursor at {cursor}/{newest}")
+        ok &= counts["evaluated"] == args.new and counts["raised"] == stored and repeated == 0 and cursor == newest
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# benchmarks/bench_charts.py
+"""Chart render time per page load: the previous pyplot code (figure built
+and rasterized by st.pyplot on every rerun) against charts.py, cold and
+from the app's query cache.
+
+    python benchmarks/bench_charts.py --repeat 20
+
+Both chart pairs of the patient page are timed: the last 30 readings and
+a 400-bucket min/mean/max window.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import QueryCache  # noqa: E402
+from charts import bp_chart, glucose_spo2_chart, bp_trend_chart, glucose_spo2_trend_chart  # noqa: E402
+
+
+def sample_frames():
+    rng = np.random.default_rng(0)
+    readings = pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=30, freq="8h"),
+        "systolic": rng.integers(100, 170, 30),
+        "diastolic": rng.integers(60, 100, 30),
+        "glucose_mg_dl": rng.uniform(80, 220, 30),
+        "spo2": rng.uniform(90, 100, 30),
+    })
+    trend = pd.DataFrame({"timestamp": pd.date_range("2024-01-01", periods=400, freq="22h")})
+    for vital, lo, hi in [("systolic", 100, 170), ("diastolic", 60, 100), ("glucose_mg_dl", 80, 220), ("spo2", 90, 100)]:
+        mean = rng.uniform(lo, hi, 400)
+        trend[f"{vital}_mean"] = mean
+        trend[f"{vital}_min"] = mean - 5
+        trend[f"{vital}_max"] = mean + 5
+    return readings, trend
+
+
+def st_pyplot(fig):
+    """What st.pyplot() does with a figure: a tight 200 dpi PNG"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def legacy_last30(recent):
+    bp_df = recent[["timestamp", "systolic", "diastolic"]].dropna().sort_values("timestamp").tail(30)
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.plot(bp_df["timestamp"], bp_df["systolic"], "b-o", label="Systolic", linewidth=2, markersize=4)
+    ax.plot(bp_df["timestamp"], bp_df["diastolic"], "r-o", label="Diastolic", linewidth=2, markersize=4)
+    ax.set_ylabel("Blood Pressure (mmHg)", fontsize=12)
+    ax.set_xlabel("Date", fontsize=12)
+    ax.legend(fontsize=10)
+    ax.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    fig.tight_layout()
+    st_pyplot(fig)
+
+    df = recent[["timestamp", "glucose_mg_dl", "spo2"]].rename(columns={"glucose_mg_dl": "glucose"}).sort_values("timestamp").tail(30)
+    fig, ax1 = plt.subplots(figsize=(8, 4))
+    ax1.plot(df["timestamp"], df["glucose"], "-o", color="tab:blue", label="Glucose", linewidth=2, markersize=4)
+    ax1.set_ylabel("Glucose (mg/dL)", color="tab:blue", fontsize=12)
+    ax1.tick_params(axis="y", labelcolor="tab:blue")
+    ax2 = ax1.twinx()
+    ax2.plot(df["timestamp"], df["spo2"], "-o", color="tab:red", label="SpO2", linewidth=2, markersize=4)
+    ax2.set_ylabel("SpO2 (%)", color="tab:red", fontsize=12)
+    ax2.tick_params(axis="y", labelcolor="tab:red")
+    ax1.set_xlabel("Date", fontsize=12)
+    ax1.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    fig.tight_layout()
+    st_pyplot(fig)
+
+
+def legacy_window(trend):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    for vital, color, label in [("systolic", "b", "Systolic"), ("diastolic", "r", "Diastolic")]:
+        ax.plot(trend["timestamp"], trend[f"{vital}_mean"], color=color, label=label, linewidth=2)
+        ax.fill_between(trend["timestamp"], trend[f"{vital}_min"], trend[f"{vital}_max"], color=color, alpha=0.15)
+    ax.set_ylabel("Blood Pressure (mmHg)", fontsize=12)
+    ax.set_xlabel("Date", fontsize=12)
+    ax.legend(fontsize=10)
+    ax.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    fig.tight_layout()
+    st_pyplot(fig)
+
+    fig, ax1 = plt.subplots(figsize=(8, 4))
+    ax1.plot(trend["timestamp"], trend["glucose_mg_dl_mean"], color="tab:blue", label="Glucose", linewidth=2)
+    ax1.fill_between(trend["timestamp"], trend["glucose_mg_dl_min"], trend["glucose_mg_dl_max"], color="tab:blue", alpha=0.15)
+    ax2 = ax1.twinx()
+    ax2.plot(trend["timestamp"], trend["spo2_mean"], color="tab:red", label="SpO2", linewidth=2)
+    ax2.fill_between(trend["timestamp"], trend["spo2_min"], trend["spo2_max"], color="tab:red", alpha=0.15)
+    ax1.set_xlabel("Date", fontsize=12)
+    ax1.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    fig.tight_layout()
+    st_pyplot(fig)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    readings, trend = sample_frames()
+    cache = QueryCache()
+    cases = {
+        "last 30 readings": (lambda: legacy_last30(readings), [(bp_chart, readings), (glucose_spo2_chart, readings)]),
+        "400-bucket window": (lambda: legacy_window(trend), [(bp_trend_chart, trend), (glucose_spo2_trend_chart, trend)]),
+    }
+    print(f"median of {args.repeat} page loads, both charts (ms)")
+    print(f"{'charts':<20}{'pyplot':>10}{'Figure':>10}{'cached':>10}")
+    for name, (legacy, renders) in cases.items():
+        legacy_ms = timed(legacy, args.repeat) * 1000
+        cold_ms = timed(lambda: [render(data) for render, data in renders], args.repeat) * 1000
+        cached_ms = timed(lambda: [cache.get_or_load(render.__name__, 1, (name,), lambda: render(data)) for render, data in renders],
+                          args.repeat) * 1000
+        print(f"{name:<20}{legacy_ms:>10.1f}{cold_ms:>10.1f}{cached_ms:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# benchmarks/bench_classify.py
+"""Check classify_readings() and suggest_for_reading() against the original
+thresholds and time both.
+
+    python benchmarks/bench_classify.py [--rows 1000000] [--parity-rows 20000]
+
+Both are checked row by row, on a sample that covers every threshold
+boundary, against reference_categories(): a frozen copy of the hardcoded
+thresholds suggest_for_reading() used before rule sets, which the default
+rule set (rule_sets/adult.json) must keep reproducing. The scalar function
+is timed on that sample and extrapolated.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from queries import as_reading  # noqa: E402
+from suggestions import suggest_for_reading, classify_readings  # noqa: E402
+
+# First suggestion text per vital -> category returned by classify_readings
+MESSAGE_CATEGORIES = {
+    "bp_stage": {
+        "🚨 HYPERTENSIVE EMERGENCY": "emergency",
+        "⚠️ HIGH BLOOD PRESSURE": "stage2",
+        "📈 ELEVATED BP": "stage1",
+        "📉 LOW BP": "low",
+        "✅ Blood pressure normal": "normal",
+    },
+    "glucose_band": {
+        "🚨 VERY HIGH GLUCOSE": "very_high",
+        "⚠️ HIGH GLUCOSE": "high",
+        "📈 IMPAIRED GLUCOSE": "impaired",
+        "📉 LOW BLOOD SUGAR": "low",
+        "✅ Glucose in normal range": "normal",
+    },
+    "temp_band": {
+        "🚨 VERY HIGH FEVER": "very_high_fever",
+        "🌡️ FEVER": "fever",
+        "❄️ LOW BODY TEMPERATURE": "low",
+        "✅ Temperature normal": "normal",
+    },
+    "spo2_band": {
+        "🚨 LOW OXYGEN SATURATION": "low",
+        "⚠️ BORDERLINE OXYGEN SATURATION": "borderline",
+        "✅ Oxygen saturation normal": "normal",
+    },
+}
+
+
+def reference_categories(reading):
+    """Categories of the original hardcoded suggest_for_reading() thresholds
+    (frozen: do not edit to match a rule set)"""
+    found = {}
+    if reading.systolic is not None and reading.diastolic is not None:
+        s, d = reading.systolic, reading.diastolic
+        if s >= 180 or d >= 120:
+            found["bp_stage"] = "emergency"
+        elif s >= 140 or d >= 90:
+            found["bp_stage"] = "stage2"
+        elif 130 <= s < 140 or 80 <= d < 90:
+            found["bp_stage"] = "stage1"
+        elif s < 90 or d < 60:
+            found["bp_stage"] = "low"
+        else:
+            found["bp_stage"] = "normal"
+    if reading.glucose_mg_dl is not None:
+        g = reading.glucose_mg_dl
+        if g >= 300:
+            found["glucose_band"] = "very_high"
+        elif g >= 200:
+            found["glucose_band"] = "high"
+        elif 140 <= g < 200:
+            found["glucose_band"] = "impaired"
+        elif g < 70:
+            found["glucose_band"] = "low"
+        else:
+            found["glucose_band"] = "normal"
+    if reading.temp_c is not None:
+        t = reading.temp_c
+        if t >= 40:
+            found["temp_band"] = "very_high_fever"
+        elif t >= 38:
+            found["temp_band"] = "fever"
+        elif t < 35:
+            found["temp_band"] = "low"
+        else:
+            found["temp_band"] = "normal"
+    if reading.spo2 is not None:
+        o = reading.spo2
+        if o < 90:
+            found["spo2_band"] = "low"
+        elif 90 <= o < 95:
+            found["spo2_band"] = "borderline"
+        else:
+            found["spo2_band"] = "normal"
+    return found
+
+
+def synthetic_readings(n, seed=0):
+    """Readings spread across and exactly on every threshold, with some missing values"""
+    rng = np.random.default_rng(seed)
+
+    def column(low, high, edges, integer=False):
+        values = rng.uniform(low, high, n)
+        values = np.round(values) if integer else np.round(values, 1)
+        on_edge = rng.random(n) < 0.2
+        values[on_edge] = rng.choice(edges, on_edge.sum())
+        values[rng.random(n) < 0.05] = np.nan
+        return values
+
+    df = pd.DataFrame({
+        "systolic": column(60, 220, [90, 130, 140, 180], integer=True),
+        "diastolic": column(40, 140, [60, 80, 90, 120], integer=True),
+        "glucose_mg_dl": column(40, 400, [70, 140, 200, 300]),
+        "temp_c": column(33, 42, [35, 38, 40]),
+        "spo2": column(80, 100, [90, 95]),
+    })
+    return df.astype({"systolic": "Int64", "diastolic": "Int64"})
+
+
+def scalar_categories(suggestions):
+    found = {}
+    for column, messages in MESSAGE_CATEGORIES.items():
+        for prefix, category in messages.items():
+            if any(s.startswith(prefix) for s in suggestions):
+                found[column] = category
+    return found
+
+
+def check_parity(df):
+    """Count category mismatches of either path against reference_categories();
+    also returns the time spent in suggest_for_reading alone"""
+    classified = classify_readings(df)
+    readings = [as_reading(row) for _, row in df.iterrows()]
+    t0 = time.perf_counter()
+    results = [suggest_for_reading(r)[0] for r in readings]
+    scalar_time = time.perf_counter() - t0
+
+    mismatches = 0
+    for i, (reading, suggestions) in enumerate(zip(readings, results)):
+        expected = reference_categories(reading)
+        scalar = scalar_categories(suggestions)
+        for column in MESSAGE_CATEGORIES:
+            got = classified[column].iloc[i]
+            got = None if pd.isna(got) else got
+            if got != expected.get(column) or scalar.get(column) != expected.get(column):
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"mismatch row {i} {column}: reference={expected.get(column)} vectorized={got} "
+                          f"scalar={scalar.get(column)} {df.iloc[i].to_dict()}")
+    return mismatches, scalar_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--parity-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    sample = synthetic_readings(args.parity_rows, seed=1)
+    mismatches, scalar_time = check_parity(sample)
+    print(f"parity: {mismatches} mismatches over {len(sample)} rows x {len(MESSAGE_CATEGORIES)} vitals")
+
+    df = synthetic_readings(args.rows)
+    t0 = time.perf_counter()
+    classify_readings(df)
+    vector_time = time.perf_counter() - t0
+    scalar_estimate = scalar_time / len(sample) * len(df)
+    print(f"{'rows':>10} {'scalar (s, est.)':>17} {'vectorized (s)':>15} {'speedup':>8}")
+    print(f"{len(df):>10} {scalar_estimate:>17.2f} {vector_time:>15.3f} {scalar_estimate / vector_time:>7.0f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
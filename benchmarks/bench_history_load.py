@@ -0,0 +1,78 @@
+# benchmarks/bench_history_load.py
+"""Compare the old ORM history load (one Reading object per row, copied into
+three DataFrames) with the columnar readings_frame() path.
+
+    python benchmarks/bench_history_load.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import Base, Reading  # noqa: E402
+from queries import readings_frame  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+PER_DAY = 1440  # one reading a minute
+
+
+def seed(engine, n):
+    """One synthetic patient with about n readings; returns (patient id, readings)"""
+    result = generate(engine, patients=1, days=n / PER_DAY, per_day=PER_DAY, gap_rate=0)
+    return result["patient_ids"][0], result["readings"]
+
+
+def orm_load(session, pid):
+    """The history section as it was: ORM objects copied into three DataFrames"""
+    dfq = session.query(Reading).filter(Reading.patient_id == pid).order_by(Reading.timestamp.desc()).all()
+    df = pd.DataFrame([{
+        "id": r.id, "timestamp": r.timestamp, "systolic": r.systolic, "diastolic": r.diastolic,
+        "glucose_mg_dl": r.glucose_mg_dl, "temp_c": r.temp_c, "spo2": r.spo2, "notes": r.notes
+    } for r in dfq])
+    bp_df = pd.DataFrame([{"timestamp": r.timestamp, "systolic": r.systolic, "diastolic": r.diastolic} for r in dfq])
+    glucose_spo2_df = pd.DataFrame([{"timestamp": r.timestamp, "glucose": r.glucose_mg_dl, "spo2": r.spo2} for r in dfq])
+    return df, bp_df, glucose_spo2_df
+
+
+def columnar_load(session, pid):
+    return readings_frame(session, pid)
+
+
+def best_of(fn, Session, pid, repeat):
+    times = []
+    for _ in range(repeat):
+        session = Session()
+        t0 = time.perf_counter()
+        fn(session, pid)
+        times.append(time.perf_counter() - t0)
+        session.close()
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'readings':>10} {'orm (s)':>10} {'columnar (s)':>13} {'speedup':>8}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(engine)
+            pid, n = seed(engine, n)
+            Session = sessionmaker(bind=engine)
+            orm = best_of(orm_load, Session, pid, args.repeat)
+            columnar = best_of(columnar_load, Session, pid, args.repeat)
+            engine.dispose()
+        print(f"{n:>10} {orm:>10.3f} {columnar:>13.3f} {orm / columnar:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_retention.py
+"""Space reclaimed by retention.py and the cost of reading archived history.
+
+    python benchmarks/bench_retention.py --patients 20 --days 730 --keep 180
+
+Fills a temporary SQLite database with synthetic.py, archives and
+downsamples every month that ended more than --keep days ago, then reports
+the database size before and after the incremental vacuum, the archive
+size, and history page timings in recent and archived time. It checks that
+the archive plus the remaining raw readings hold exactly the original
+readings, that an export still returns them all, and that paging through a
+patient's whole history returns them all, in order.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import Reading, create_db_engine, init_db, session_scope  # noqa: E402
+from exporter import iter_export_frames  # noqa: E402
+from queries import export_select, frame_from_rows, page_cursor, EXPORT_COLUMNS  # noqa: E402
+from retention import (  # noqa: E402
+    RESOLUTION_LABELS, apply_retention, archived_months, read_archive, history_with_archive, incremental_vacuum,
+)
+from synthetic import generate  # noqa: E402
+
+
+def mb(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1e6 \
+        if os.path.isdir(path) else os.path.getsize(path) / 1e6
+
+
+def time_pages(Session, pid, page_size, before, archive_dir, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with session_scope(Session) as session:
+            history_with_archive(session, pid, page_size, before=before, archive_dir=archive_dir)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--per-day", type=float, default=6)
+    parser.add_argument("--keep", type=int, default=180, help="RETENTION_DAYS")
+    parser.add_argument("--resolution", choices=["hour", "day"], default="day")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path, archive_dir = os.path.join(tmp, "retention.db"), os.path.join(tmp, "archive")
+        engine = create_db_engine(f"sqlite:///{path}")
+        init_db(bind=engine)
+        generated = generate(engine, patients=args.patients, days=args.days, per_day=args.per_day, seed=1)
+        original = pd.concat(iter_export_frames(bind=engine, archive_dir=archive_dir), ignore_index=True)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        before_mb = mb(path)
+        print(f"{generated['readings']:,} readings, {args.patients} patients: {before_mb:.1f} MB")
+
+        t0 = time.perf_counter()
+        result = apply_retention(engine, days=args.keep, resolution=args.resolution, archive_dir=archive_dir)
+        retention_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        freed = incremental_vacuum(engine)
+        vacuum_s = time.perf_counter() - t0
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            left = conn.execute(select(func.count()).select_from(Reading)).scalar()
+        print(f"archived {result['archived']:,} readings of {result['months']} months into "
+              f"{result['downsampled']:,} {RESOLUTION_LABELS[args.resolution]} readings in {retention_s:.1f}s; "
+              f"vacuum freed {freed:,} pages in {vacuum_s:.2f}s")
+        print(f"database {before_mb:.1f} MB -> {mb(path):.1f} MB ({left:,} rows), archive {mb(archive_dir):.1f} MB")
+
+        # Archive + remaining raw readings == the original readings
+        archived = pd.concat(
+            [read_archive(pid, month, archive_dir) for pid in generated["patient_ids"]
+             for month in archived_months(pid, archive_dir)], ignore_index=True
+        )
+        with engine.connect() as conn:
+            raw = frame_from_rows(conn.execute(export_select().where(Reading.sample_count.is_(None))).all(),
+                                  columns=EXPORT_COLUMNS)
+        rebuilt = pd.concat([archived, raw], ignore_index=True).sort_values("id", ignore_index=True)
+        assert rebuilt.equals(original.sort_values("id", ignore_index=True)), "archive + raw differ from the originals"
+        # The export merges the archive back in, in the same order as before retention
+        exported = pd.concat(iter_export_frames(bind=engine, archive_dir=archive_dir), ignore_index=True)
+        assert exported.equals(original), "export differs from the originals"
+
+        # Paging through the whole history of one patient returns every original, newest first
+        Session = sessionmaker(bind=engine)
+        pid = generated["patient_ids"][0]
+        pages, cursor, seen = 0, None, []
+        while True:
+            with session_scope(Session) as session:
+                df, has_more = history_with_archive(session, pid, args.page_size, before=cursor, archive_dir=archive_dir)
+            seen += df["id"].tolist()
+            pages += 1
+            if not has_more:
+                break
+            cursor = page_cursor(df)
+        expected = original[original["patient_id"] == pid].sort_values(["timestamp", "id"], ascending=False)["id"].tolist()
+        assert seen == expected, "paged history differs from the originals"
+        print(f"paged patient {pid}'s {len(seen):,} readings in {pages} pages: archive + raw match the originals")
+
+        # A page in recent time and one deep in archived time
+        old = original[(original["patient_id"] == pid)].iloc[len(expected) // 4]
+        recent_ms = time_pages(Session, pid, args.page_size, None, archive_dir, args.repeat)
+        archived_ms = time_pages(Session, pid, args.page_size, (old["timestamp"].to_pydatetime(), int(old["id"])),
+                                 archive_dir, args.repeat)
+        print(f"history page: recent {recent_ms:.2f} ms, archived {archived_ms:.2f} ms")
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
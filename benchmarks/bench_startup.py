@@ -0,0 +1,105 @@
+# benchmarks/bench_startup.py
+"""Startup profile of app.py: what its imports cost (`python -X importtime`)
+and how long the first render and a rerun take.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --source /path/to/other/checkout --json
+
+Each run starts a fresh interpreter that renders the app once with
+Streamlit's AppTest (no patient selected, on a new temporary database) and
+then reruns it, as the next interaction in the session would. `-X
+importtime` covers only the imports triggered by running the script.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter, in a copy of the source tree
+CHILD = r"""
+import sys, time
+from streamlit.testing.v1 import AppTest
+sys.stderr.write("--- app ---\n")
+at = AppTest.from_file("app.py", default_timeout=120)
+t0 = time.perf_counter()
+at.run()
+first = time.perf_counter() - t0
+assert not at.exception, at.exception
+t0 = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - t0
+assert not at.exception, at.exception
+print(f"{first} {rerun} {'matplotlib' in sys.modules}")
+"""
+
+
+def parse_importtime(stderr):
+    """{top-level package: µs} of the imports after the marker, summing the
+    self time of every module of the package wherever it was imported from"""
+    totals = {}
+    lines = stderr.split("--- app ---\n", 1)[-1].splitlines()
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line.split("|")
+        try:
+            us = int(self_us.split(":")[1])
+        except ValueError:
+            continue  # the header line
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + us
+    return totals
+
+
+def profile(source):
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in os.listdir(source):
+            if name.endswith(".py"):
+                shutil.copy(os.path.join(source, name), tmp)
+        if os.path.isdir(os.path.join(source, "rule_sets")):
+            shutil.copytree(os.path.join(source, "rule_sets"), os.path.join(tmp, "rule_sets"))
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}"}
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD],
+            cwd=tmp, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    first, rerun, matplotlib = proc.stdout.split()[-3:]
+    imports = parse_importtime(proc.stderr)
+    return {
+        "first_render_s": float(first),
+        "rerun_s": float(rerun),
+        "import_s": sum(imports.values()) / 1e6,
+        "matplotlib_loaded": matplotlib == "True",
+        "imports_ms": {name: us / 1000 for name, us in sorted(imports.items(), key=lambda kv: -kv[1])},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=ROOT, help="directory holding app.py (default: this checkout)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters; the fastest is reported")
+    parser.add_argument("--top", type=int, default=12, help="packages listed by import time")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    result = min((profile(args.source) for _ in range(args.runs)), key=lambda r: r["first_render_s"])
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    print(f"first render {result['first_render_s'] * 1000:.0f} ms (imports {result['import_s'] * 1000:.0f} ms), "
+          f"rerun {result['rerun_s'] * 1000:.0f} ms, matplotlib loaded: {result['matplotlib_loaded']}")
+    print("imports triggered by app.py, by package (ms):")
+    for name, ms in list(result["imports_ms"].items())[:args.top]:
+        print(f"  {name:<24}{ms:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# benchmarks/bench_suite.py
+"""End-to-end timings of the app's key operations at several data sizes,
+as JSON that can be compared between versions.
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+    python benchmarks/bench_suite.py --sizes 1000 100000 10000000 --repeat 5
+
+For each size a temporary SQLite database is filled by synthetic.py
+(patients of about 5,000 readings each, at least 5 patients), then each
+operation is run --repeat times on the patient with the most readings,
+the way app.py runs it but without the query cache. --compare exits with
+status 1 when an operation's median is more than --threshold times the
+baseline's.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from db import Reading, create_db_engine, init_db, session_scope  # noqa: E402
+from exporter import export_readings  # noqa: E402
+from queries import history_page, as_reading, trend_frame, latest_readings_frame  # noqa: E402
+from rollups import reading_stats, add_to_daily_stats, refresh_daily_stats, summary_stats  # noqa: E402
+from rules import registry  # noqa: E402
+from search import search_patients, reading_conditions  # noqa: E402
+from suggestions import suggest_for_reading, classify_readings  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+READINGS_PER_PATIENT = 5000
+PER_DAY = 6
+PAGE_SIZE = 50
+
+
+def build(path, size):
+    engine = create_db_engine(f"sqlite:///{path}")
+    init_db(bind=engine)
+    patients = max(5, size // READINGS_PER_PATIENT)
+    # Gaps drop a few percent of the scheduled readings
+    days = math.ceil(size / patients / PER_DAY * 1.07)
+    t0 = time.perf_counter()
+    result = generate(engine, patients=patients, days=days, per_day=PER_DAY, seed=size)
+    return engine, result, time.perf_counter() - t0
+
+
+def operations(engine, Session, pid, tmp):
+    """name -> callable, in the order they are timed"""
+    def with_session(fn):
+        def run():
+            with session_scope(Session) as session:
+                return fn(session)
+        return run
+
+    def patient_search(session):
+        for text in ("", "so", "sharma"):
+            search_patients(session, text)
+
+    def history_filtered(session):
+        ranges = registry.get().normal_ranges()
+        out_of_range = tuple((vital, *ranges[vital]) for vital in ("systolic", "spo2"))
+        history_page(session, pid, PAGE_SIZE, where=reading_conditions(out_of_range=out_of_range))
+        history_page(session, pid, PAGE_SIZE, where=reading_conditions(text="dizzy"))
+
+    def suggestions(session):
+        page, _ = history_page(session, pid, PAGE_SIZE)
+        classify_readings(page)
+        suggest_for_reading(as_reading(page.iloc[0]))
+
+    def chart_data(session):
+        page, _ = history_page(session, pid, PAGE_SIZE)
+        page.sort_values("timestamp").tail(30)
+        end = page.iloc[0]["timestamp"].to_pydatetime()
+        for days in (90, 365):
+            trend_frame(session, pid, end - timedelta(days=days), end)
+
+    def summary(session):
+        as_of = session.execute(select(func.max(Reading.timestamp)).where(Reading.patient_id == pid)).scalar().date()
+        for days in (7, 30, 90):
+            summary_stats(session, pid, as_of, days)
+
+    def csv_export():
+        path = os.path.join(tmp, "export.csv")
+        export_readings(path, "csv", patient_ids=[pid], bind=engine, archive_dir=os.path.join(tmp, "archive"))
+        os.remove(path)
+
+    inserted = []
+
+    def insert_reading():
+        r = Reading(patient_id=pid, timestamp=datetime.utcnow(), systolic=128, diastolic=84, glucose_mg_dl=101.0,
+                    temp_c=36.8, spo2=97.0, notes=None)
+        stats = reading_stats([r])
+        with session_scope(Session) as session:
+            session.add(r)
+            session.flush()
+            add_to_daily_stats(session.connection(), stats)
+            inserted.append(r.id)
+
+    def delete_reading():
+        with session_scope(Session) as session:
+            r = session.get(Reading, inserted.pop())
+            day = r.timestamp.date()
+            session.delete(r)
+            session.flush()
+            refresh_daily_stats(session.connection(), [pid], day, day)
+
+    return {
+        "patient_search": with_session(patient_search),
+        "history_page": with_session(lambda session: history_page(session, pid, PAGE_SIZE)),
+        "history_filtered": with_session(history_filtered),
+        "suggestions": with_session(suggestions),
+        "chart_data": with_session(chart_data),
+        "summary": with_session(summary),
+        "ward_overview": with_session(latest_readings_frame),
+        "csv_export": csv_export,
+        "insert_reading": insert_reading,
+        # Deletes the readings insert_reading added, so every size ends as generated
+        "delete_reading": delete_reading,
+    }
+
+
+def run_size(size, repeat, tmp):
+    engine, generated, generate_s = build(os.path.join(tmp, f"suite_{size}.db"), size)
+    Session = sessionmaker(bind=engine)
+    with engine.connect() as conn:
+        pid, busiest = conn.execute(
+            select(Reading.patient_id, func.count()).group_by(Reading.patient_id).order_by(func.count().desc()).limit(1)
+        ).first()
+    results = {}
+    for name, op in operations(engine, Session, pid, tmp).items():
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            op()
+            times.append((time.perf_counter() - t0) * 1000)
+        results[name] = {"median_ms": statistics.median(times), "min_ms": min(times), "max_ms": max(times)}
+    engine.dispose()
+    return {
+        "readings": generated["readings"], "patients": len(generated["patient_ids"]),
+        "patient_readings": busiest, "generate_s": generate_s, "operations": results,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        if commit and subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                     capture_output=True, text=True).stdout.strip():
+            commit += "-dirty"
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None, "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(), "sqlite": sqlite3.sqlite_version,
+        "sqlalchemy": sqlalchemy.__version__, "pandas": pd.__version__,
+        "sqlite_profile": os.environ.get("SQLITE_PROFILE", "tuned"),
+    }
+
+
+def compare(report, baseline, threshold):
+    """Print median ratios against the baseline; returns the regressions"""
+    regressions = []
+    print(f"\nagainst {baseline['environment'].get('commit') or 'baseline'} (ratio of medians, > {threshold} flagged)", file=sys.stderr)
+    for size, result in report["sizes"].items():
+        base = baseline["sizes"].get(size)
+        if base is None:
+            continue
+        for name, op in result["operations"].items():
+            if name not in base["operations"]:
+                continue
+            ratio = op["median_ms"] / max(base["operations"][name]["median_ms"], 1e-6)
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"  {int(size):>10,}  {name:<16}{ratio:>7.2f}x{flag}", file=sys.stderr)
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000], help="total readings per database")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="write the JSON report here (default: print it)")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median ratio that counts as a regression")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "repeat": args.repeat, "sizes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            result = report["sizes"][str(size)] = run_size(size, args.repeat, tmp)
+            print(f"{result['readings']:,} readings, {result['patients']} patients "
+                  f"(generated in {result['generate_s']:.1f}s; timed patient has {result['patient_readings']:,})",
+                  file=sys.stderr)
+            for name, op in result["operations"].items():
+                print(f"  {name:<16}{op['median_ms']:>10.2f} ms  (min {op['min_ms']:.2f})", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(report, json.load(f), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# benchmarks/bench_ward_overview.py
+"""Time the ward overview data path (latest reading per patient + alert levels)
+against a ROW_NUMBER() window over the whole readings table.
+
+    python benchmarks/bench_ward_overview.py [--patients 10000] [--readings 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import Base  # noqa: E402
+from queries import latest_readings_frame  # noqa: E402
+from suggestions import classify_readings, alert_levels  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+PER_DAY = 4  # readings a day per patient
+
+ROW_NUMBER_SQL = """
+SELECT p.id, p.name, r.timestamp, r.systolic, r.diastolic, r.glucose_mg_dl, r.temp_c, r.spo2
+FROM patients p LEFT JOIN (
+    SELECT readings.*, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY timestamp DESC, id DESC) AS rn
+    FROM readings
+) r ON r.patient_id = p.id AND r.rn = 1
+ORDER BY p.name
+"""
+
+
+def seed(engine, patients, readings):
+    """Synthetic patients with about `readings` readings each; returns the total"""
+    return generate(engine, patients=patients, days=readings / PER_DAY, per_day=PER_DAY, gap_rate=0)["readings"]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--readings", type=int, default=100, help="about this many readings per patient")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        total = seed(engine, args.patients, args.readings)
+        Session = sessionmaker(bind=engine)
+
+        def overview():
+            session = Session()
+            try:
+                ward = latest_readings_frame(session)
+                alert_levels(classify_readings(ward))
+            finally:
+                session.close()
+
+        def row_number():
+            with engine.connect() as conn:
+                conn.execute(text(ROW_NUMBER_SQL)).fetchall()
+
+        seek = timed(overview, args.repeat)
+        window = timed(row_number, args.repeat)
+        engine.dispose()
+
+    print(f"{args.patients} patients, {total} readings")
+    print(f"  overview (seek + classify): {seek:.3f}s")
+    print(f"  ROW_NUMBER() query alone:   {window:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
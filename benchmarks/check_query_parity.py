@@ -0,0 +1,136 @@
+# benchmarks/check_query_parity.py
+"""Seed several databases with the same readings, run the app's queries on
+each and check that they return the same frames.
+
+    python benchmarks/check_query_parity.py
+    python benchmarks/check_query_parity.py --url postgresql+psycopg2://localhost/healthmate_parity
+
+SQLite is always checked, under every SQLITE_PROFILES entry; --url (repeatable)
+or PARITY_DATABASE_URL adds server databases. Their tables are dropped and
+recreated, so point it at a scratch database. Exits with 1 on any mismatch.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import Base, Patient, Reading, SQLITE_PROFILES, create_db_engine, init_db, session_scope  # noqa: E402
+from partitions import ensure_month_partitions  # noqa: E402
+from queries import (  # noqa: E402
+    readings_frame, history_page, page_cursor, trend_frame, latest_readings_frame, frame_from_rows,
+    export_select, EXPORT_COLUMNS,
+)
+from rollups import rebuild_daily_stats, summary_stats  # noqa: E402
+from search import search_patients  # noqa: E402
+from suggestions import classify_readings, alert_levels  # noqa: E402
+
+START = datetime(2024, 11, 1)
+PATIENTS = 12
+READINGS = 400
+
+
+def seed(engine):
+    """Same patients and readings on every database: whole-second timestamps
+    over three months, with missing vitals and a patient without readings.
+    Returns the patient ids in name order."""
+    with engine.begin() as conn:
+        # Ids from the database (RETURNING), so PostgreSQL's sequence stays ahead of them
+        patient_ids = conn.execute(
+            Patient.__table__.insert().returning(Patient.id, sort_by_parameter_order=True),
+            [{"name": f"Patient {i:02d}"} for i in range(1, PATIENTS + 1)]
+        ).scalars().all()
+    readings = []
+    for pid in range(1, PATIENTS):
+        for k in range(READINGS):
+            readings.append({
+                "patient_id": patient_ids[pid - 1],
+                "timestamp": START + timedelta(seconds=(pid * 7919 + k * 20011) % (90 * 86400)),
+                "systolic": None if k % 11 == 0 else 90 + (pid * k) % 100,
+                "diastolic": None if k % 13 == 0 else 55 + (pid + k) % 60,
+                "glucose_mg_dl": None if k % 5 == 0 else 60.0 + (pid * k) % 260 + 0.5,
+                "temp_c": None if k % 7 == 0 else 35.5 + (k % 45) / 10,
+                "spo2": None if k % 3 == 0 else 86.0 + (pid + k) % 14,
+                "notes": f"note {k}" if k % 17 == 0 else None,
+            })
+    with engine.begin() as conn:
+        ensure_month_partitions(conn, START, START + timedelta(days=90))
+        conn.execute(Reading.__table__.insert(), readings)
+        rebuild_daily_stats(conn)
+    return patient_ids
+
+
+def run_queries(Session, patient_ids):
+    """name -> DataFrame for every query the app runs"""
+    p1, p2, p3, p4, p5, p6 = patient_ids[:6]
+    results = {}
+    with session_scope(Session) as session:
+        for name, text in [("first", ""), ("prefix", "patient 1"), ("words", "07")]:
+            results[f"search_patients_{name}"] = pd.DataFrame(search_patients(session, text), columns=["id", "name"])
+        pages, cursor, has_more = [], None, True
+        while has_more:
+            page, has_more = history_page(session, p1, 37, before=cursor)
+            pages.append(page)
+            cursor = page_cursor(page)
+        results["history_pages"] = pd.concat(pages, ignore_index=True)
+        results["readings_frame_limit"] = readings_frame(session, p2, limit=30)
+        full = readings_frame(session, p3)
+        results["classify_readings"] = classify_readings(full).astype(str)
+        results["trend_frame"] = trend_frame(session, p3, START, START + timedelta(days=90), buckets=60)
+        ward = latest_readings_frame(session)
+        results["latest_readings_frame"] = ward
+        results["alert_levels"] = pd.DataFrame({"level": alert_levels(classify_readings(ward)).astype(str)})
+        results["summary_stats"] = summary_stats(session, p4, date(2025, 1, 15), 30).reset_index()
+        result = session.connection().execute(export_select([p5, p6], START + timedelta(days=10), START + timedelta(days=40)))
+        try:
+            results["export_select"] = frame_from_rows(result.cursor.fetchall(), columns=EXPORT_COLUMNS)
+        finally:
+            result.close()
+    return results
+
+
+def check_url(url, sqlite_profile=None):
+    engine = create_db_engine(url, sqlite_profile=sqlite_profile) if sqlite_profile else create_db_engine(url)
+    try:
+        Base.metadata.drop_all(engine)
+        init_db(bind=engine)
+        patient_ids = seed(engine)
+        return run_queries(sessionmaker(bind=engine), patient_ids)
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", action="append", default=[], help="extra database URL to check (repeatable)")
+    args = parser.parse_args()
+    urls = args.url + ([os.environ["PARITY_DATABASE_URL"]] if os.environ.get("PARITY_DATABASE_URL") else [])
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in SQLITE_PROFILES:
+            runs[f"sqlite ({profile})"] = check_url(f"sqlite:///{os.path.join(tmp, profile + '.db')}", profile)
+    for url in urls:
+        runs[url.split("@")[-1]] = check_url(url)
+
+    (reference_name, reference), *others = runs.items()
+    print(f"reference: {reference_name}, {sum(len(df) for df in reference.values())} result rows")
+    mismatches = 0
+    for name, results in others:
+        for query, expected in reference.items():
+            try:
+                pd.testing.assert_frame_equal(results[query], expected, check_exact=False, rtol=1e-9)
+            except AssertionError as e:
+                mismatches += 1
+                print(f"  MISMATCH {name}: {query}: {str(e).splitlines()[0]}")
+            else:
+                print(f"  ok       {name}: {query} ({len(expected)} rows)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
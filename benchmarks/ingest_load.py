@@ -0,0 +1,161 @@
+# benchmarks/ingest_load.py
+"""Load generator for the ingestion service: sustained readings/sec and
+end-to-end latency (request sent -> batch committed -> response).
+
+    python benchmarks/ingest_load.py --clients 32 --batch 10 --seconds 10
+    python benchmarks/ingest_load.py --url http://127.0.0.1:8502 --patients 50
+
+Without --url the service is started in a subprocess on a temporary SQLite
+database with --patients patients. A --resend fraction of requests repeats
+an earlier request, as a device retrying after a timeout would; at the end
+the stored row count is compared with the distinct readings sent.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from db import Patient, create_db_engine, init_db  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def start_service(tmp, patients, port):
+    url = f"sqlite:///{os.path.join(tmp, 'ingest.db')}"
+    engine = create_db_engine(url)
+    init_db(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Patient.__table__.insert(), [{"id": i, "name": f"Patient {i}"} for i in range(1, patients + 1)])
+    engine.dispose()
+    service = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "ingest.py"), "--port", str(port)],
+        env={**os.environ, "DATABASE_URL": url}, cwd=ROOT,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return service, url
+        except OSError:
+            time.sleep(0.1)
+    service.kill()
+    raise RuntimeError("ingestion service did not start")
+
+
+def client(host, port, client_id, patients, batch, deadline, resend, stats, lock):
+    rng = random.Random(client_id)
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    sent = []
+    seq = 0
+    while time.monotonic() < deadline:
+        if sent and rng.random() < resend:
+            body = rng.choice(sent)
+        else:
+            readings = []
+            for _ in range(batch):
+                seq += 1
+                readings.append({
+                    "key": f"device-{client_id}:{seq}",
+                    "patient_id": rng.randint(1, patients),
+                    "timestamp": (START + timedelta(seconds=client_id * 1_000_000 + seq)).isoformat() + "Z",
+                    "systolic": rng.randint(95, 185),
+                    "diastolic": rng.randint(55, 115),
+                    "spo2": round(rng.uniform(88, 100), 1),
+                })
+            body = json.dumps(readings)
+            sent.append(body)
+        t0 = time.perf_counter()
+        conn.request("POST", "/readings", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        result = json.loads(response.read())
+        latency = time.perf_counter() - t0
+        with lock:
+            stats["latencies"].append(latency)
+            if response.status != 200:
+                stats["errors"] += 1
+                continue
+            stats["inserted"] += result["inserted"]
+            stats["duplicates"] += result["duplicates"]
+            stats["rejected"] += len(result["rejected"])
+    with lock:
+        stats["distinct"] += seq
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="running service (default: start one on a temporary database)")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent devices, one connection each")
+    parser.add_argument("--batch", type=int, default=10, help="readings per request")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--resend", type=float, default=0.05, help="fraction of requests that repeat an earlier one")
+    parser.add_argument("--port", type=int, default=8599, help="port of the service started without --url")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = db_url = None
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            service, db_url = start_service(tmp, args.patients, args.port)
+            host, port = "127.0.0.1", args.port
+        try:
+            stats = {"latencies": [], "inserted": 0, "duplicates": 0, "rejected": 0, "errors": 0, "distinct": 0}
+            lock = threading.Lock()
+            deadline = time.monotonic() + args.seconds
+            started = time.perf_counter()
+            threads = [
+                threading.Thread(target=client, args=(host, port, i, args.patients, args.batch, deadline, args.resend, stats, lock))
+                for i in range(args.clients)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            if service is not None:
+                service.terminate()
+                service.wait()
+
+        stored = None
+        if db_url:
+            engine = create_db_engine(db_url)
+            with engine.connect() as conn:
+                stored = conn.exec_driver_sql("SELECT count(*) FROM readings").scalar()
+            engine.dispose()
+
+    latencies = stats["latencies"]
+    print(f"clients={args.clients} batch={args.batch} seconds={elapsed:.1f} requests={len(latencies)} errors={stats['errors']}")
+    print(f"  stored {stats['inserted'] / elapsed:,.0f} readings/s ({stats['inserted']} inserted, "
+          f"{stats['duplicates']} acknowledged duplicates, {stats['rejected']} rejected)")
+    print(f"  latency ms: p50 {percentile(latencies, 50) * 1000:.1f}  p95 {percentile(latencies, 95) * 1000:.1f}  "
+          f"p99 {percentile(latencies, 99) * 1000:.1f}  max {max(latencies, default=float('nan')) * 1000:.1f}")
+    if stored is not None:
+        print(f"  rows in database: {stored} (distinct readings sent: {stats['distinct']})")
+        return 0 if stored == stats["distinct"] == stats["inserted"] else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
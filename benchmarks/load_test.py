@@ -0,0 +1,109 @@
+# benchmarks/load_test.py
+"""Concurrent readers and writers against one SQLite file, as many Streamlit
+sessions would produce. Reports p50/p99 latency and failures per operation.
+
+    python benchmarks/load_test.py --readers 8 --writers 4 --seconds 10 --profile tuned
+    python benchmarks/load_test.py --profile default   # rollback journal, no busy_timeout
+
+Readers load a history page and the latest readings of a random patient;
+writers save a reading and upsert its daily rollup in one transaction,
+like the reading form does.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import Base, Reading, SQLITE_PROFILES, create_db_engine, session_scope  # noqa: E402
+from queries import history_page, readings_frame  # noqa: E402
+from rollups import reading_stats, add_to_daily_stats  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+PER_DAY = 144  # seed readings a day per patient
+
+
+def seed(engine, patients, readings):
+    """Synthetic patients with about `readings` readings each; returns their ids"""
+    return generate(engine, patients=patients, days=readings / PER_DAY, per_day=PER_DAY, gap_rate=0)["patient_ids"]
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def worker(kind, Session, patient_ids, deadline, latencies, errors, seed_value):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    while time.perf_counter() < deadline:
+        pid = rng.choice(patient_ids)
+        t0 = time.perf_counter()
+        try:
+            if kind == "write":
+                ts = now - timedelta(days=rng.randint(0, 60), minutes=rng.randint(0, 1439))
+                reading = Reading(patient_id=pid, timestamp=ts, systolic=120, diastolic=80,
+                                  glucose_mg_dl=95.0, temp_c=36.7, spo2=98.0)
+                stats = reading_stats([reading])
+            with session_scope(Session) as session:
+                if kind == "read":
+                    history_page(session, pid, 50)
+                    readings_frame(session, pid, limit=30)
+                else:
+                    session.add(reading)
+                    session.flush()
+                    add_to_daily_stats(session.connection(), stats)
+        except Exception as e:
+            errors.append(f"{kind}: {type(e).__name__}: {str(e).splitlines()[0]}")
+            continue
+        latencies.append(time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=500, help="seed readings per patient")
+    parser.add_argument("--profile", choices=list(SQLITE_PROFILES), default="tuned")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'load.db')}", sqlite_profile=args.profile)
+        Base.metadata.create_all(engine)
+        patient_ids = seed(engine, args.patients, args.readings)
+        Session = sessionmaker(bind=engine)
+
+        results = {"read": ([], []), "write": ([], [])}
+        deadline = time.perf_counter() + args.seconds
+        threads = [
+            threading.Thread(target=worker, args=(kind, Session, patient_ids, deadline, *results[kind], i))
+            for i, kind in enumerate(["read"] * args.readers + ["write"] * args.writers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    print(f"profile={args.profile} readers={args.readers} writers={args.writers} seconds={args.seconds}")
+    print(f"{'op':>6} {'ok':>7} {'failed':>7} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind, (latencies, errors) in results.items():
+        print(f"{kind:>6} {len(latencies):>7} {len(errors):>7} {len(latencies) / args.seconds:>8.1f} "
+              f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f}")
+    failures = sorted({e for _, errors in results.values() for e in errors})
+    for failure in failures[:5]:
+        print(f"  e.g. {failure}")
+
+
+if __name__ == "__main__":
+    main()
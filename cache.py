@@ -0,0 +1,66 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+# patient_id for queries that span every patient: bumped by every write
+ALL_PATIENTS = "*"
+
+
+class QueryCache:
+    """Bounded LRU of query results, invalidated by per-patient data versions.
+
+    Every entry is keyed by (name, patient_id, version, args). Writers call
+    bump(patient_id) after committing, which moves that patient to a new
+    version so later lookups miss and reload; entries for old versions are
+    never hit again and age out of the LRU. patient_id=None is the version of
+    the patient list itself, and ALL_PATIENTS changes with any bump. `ttl`
+    (seconds) bounds how stale an entry can get when another process writes
+    to the database without bumping.
+    """
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, patient_id=None):
+        with self._lock:
+            return self._versions.get(patient_id, 0)
+
+    def bump(self, patient_id=None):
+        """Mark the data of patient_id (or the patient list, for None) as changed"""
+        with self._lock:
+            for key in {patient_id, ALL_PATIENTS}:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def get_or_load(self, name, patient_id, args, loader):
+        """Cached result of loader() for this query, loading it on a miss"""
+        key = (name, patient_id, self.version(patient_id), args)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
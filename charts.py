@@ -0,0 +1,104 @@
+# charts.py
+"""Trend charts rendered to PNG with matplotlib's object-oriented API.
+
+No pyplot: each chart is a standalone Figure on an Agg canvas, so
+concurrent sessions never share pyplot's global figure state, and the
+returned PNG bytes can be cached (see chart_image() in app.py) instead of
+being re-rendered on every rerun. Every function returns None when there
+is nothing to plot.
+"""
+import io
+import os
+
+from matplotlib.figure import Figure
+
+FIGSIZE = (8, 4)
+# 200 matches what st.pyplot() used to send (sharp on high-DPI screens);
+# 100 draws in about two thirds of the time
+CHART_DPI = int(os.environ.get("CHART_DPI", "200"))
+
+
+def _png(fig, ax):
+    ax.set_xlabel("Date", fontsize=12)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis="x", labelrotation=45)
+    # Laid out once here; bbox_inches="tight" would draw the figure a second time
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=CHART_DPI)
+    return buf.getvalue()
+
+
+def _bp(ax, df, band=False):
+    for vital, color, label in [("systolic", "b", "Systolic"), ("diastolic", "r", "Diastolic")]:
+        if band:
+            ax.plot(df["timestamp"], df[f"{vital}_mean"], color=color, label=label, linewidth=2)
+            ax.fill_between(df["timestamp"], df[f"{vital}_min"], df[f"{vital}_max"], color=color, alpha=0.15)
+        else:
+            ax.plot(df["timestamp"], df[vital], color=color, marker="o", label=label, linewidth=2, markersize=4)
+    ax.set_ylabel("Blood Pressure (mmHg)", fontsize=12)
+    ax.legend(fontsize=10)
+
+
+def _dual_axis(ax, series):
+    """Glucose on the left axis and SpO2 on a twin right axis; `series` maps
+    each to a (frame, value column, min/max columns or None) tuple"""
+    for i, (label, ylabel, color) in enumerate([("Glucose", "Glucose (mg/dL)", "tab:blue"), ("SpO2", "SpO2 (%)", "tab:red")]):
+        data, column, band = series[label]
+        if data.empty:
+            continue
+        axis = ax if i == 0 else ax.twinx()
+        if band:
+            axis.plot(data["timestamp"], data[column], color=color, label=label, linewidth=2)
+            axis.fill_between(data["timestamp"], data[band[0]], data[band[1]], color=color, alpha=0.15)
+        else:
+            axis.plot(data["timestamp"], data[column], color=color, marker="o", label=label, linewidth=2, markersize=4)
+        axis.set_ylabel(ylabel, color=color, fontsize=12)
+        axis.tick_params(axis="y", labelcolor=color)
+
+
+# --- Last N readings ---
+def bp_chart(readings):
+    """Systolic/diastolic of a readings frame (timestamp ascending)"""
+    bp = readings[["timestamp", "systolic", "diastolic"]].dropna()
+    if bp.empty:
+        return None
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    _bp(ax, bp)
+    return _png(fig, ax)
+
+
+def glucose_spo2_chart(readings):
+    if readings.empty:
+        return None
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    _dual_axis(ax, {
+        "Glucose": (readings.dropna(subset=["glucose_mg_dl"]), "glucose_mg_dl", None),
+        "SpO2": (readings.dropna(subset=["spo2"]), "spo2", None),
+    })
+    return _png(fig, ax)
+
+
+# --- Time windows (min/mean/max per bucket, see queries.trend_frame) ---
+def bp_trend_chart(trend):
+    bp = trend.dropna(subset=["systolic_mean", "diastolic_mean"])
+    if bp.empty:
+        return None
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    _bp(ax, bp, band=True)
+    return _png(fig, ax)
+
+
+def glucose_spo2_trend_chart(trend):
+    if trend.empty:
+        return None
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.add_subplot()
+    _dual_axis(ax, {
+        "Glucose": (trend.dropna(subset=["glucose_mg_dl_mean"]), "glucose_mg_dl_mean", ("glucose_mg_dl_min", "glucose_mg_dl_max")),
+        "SpO2": (trend.dropna(subset=["spo2_mean"]), "spo2_mean", ("spo2_min", "spo2_max")),
+    })
+    return _png(fig, ax)
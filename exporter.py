@@ -0,0 +1,141 @@
+# exporter.py
+"""Streaming export of readings to CSV or Parquet.
+
+    python exporter.py history.parquet --patient-id 3 --start 2024-01-01 --end 2024-12-31
+    python exporter.py all_patients.csv
+
+Rows are read from the database in chunks and appended to the output file
+chunk by chunk, so memory use does not grow with the size of the history.
+Readings archived by retention.py are exported in place of the averaged
+readings that replaced them.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from db import engine, Reading
+from queries import frame_from_rows, export_select, EXPORT_COLUMNS
+from retention import ARCHIVE_DIR, merge_archive
+
+EXPORT_FORMATS = {"csv": ("text/csv", ".csv"), "parquet": ("application/vnd.apache.parquet", ".parquet")}
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def iter_raw_frames(patient_ids=None, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE, bind=engine):
+    """Typed DataFrames of at most chunk_size raw readings each (downsampled
+    readings left out). Raises RuntimeError if fewer readings came back than
+    the query matched."""
+    stmt = export_select(patient_ids, start, end).where(Reading.sample_count.is_(None))
+    with bind.connect() as conn:
+        expected = conn.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+        # SQLite steps its cursor lazily anyway. Server databases stream through a
+        # server-side cursor, whose first rows SQLAlchemy buffers ahead of the
+        # DBAPI cursor, so those are fetched through the Result to include them
+        stream = conn.dialect.name != "sqlite"
+        result = conn.execution_options(stream_results=stream).execute(stmt)
+        fetchmany = result.fetchmany if stream else result.cursor.fetchmany
+        count = 0
+        try:
+            while True:
+                rows = fetchmany(chunk_size)
+                if not rows:
+                    break
+                count += len(rows)
+                yield frame_from_rows(rows, columns=EXPORT_COLUMNS)
+        finally:
+            result.close()
+        # Readings added meanwhile may come on top; fewer means rows were lost
+        if count < expected:
+            raise RuntimeError(f"Export read {count} of {expected} readings; try again")
+
+
+def iter_export_frames(patient_ids=None, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE, bind=engine,
+                       archive_dir=ARCHIVE_DIR):
+    """Typed DataFrames of the original readings: raw readings from the
+    database with those archived by retention.py merged in"""
+    return merge_archive(iter_raw_frames(patient_ids, start, end, chunk_size, bind), patient_ids, start, end, archive_dir)
+
+
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("patient_id", pa.int64()),
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("systolic", pa.int64()),
+        ("diastolic", pa.int64()),
+        ("glucose_mg_dl", pa.float64()),
+        ("temp_c", pa.float64()),
+        ("spo2", pa.float64()),
+        ("notes", pa.string()),
+    ])
+
+
+def export_readings(path, fmt="csv", patient_ids=None, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE, bind=engine,
+                    archive_dir=ARCHIVE_DIR):
+    """Write readings to `path` as CSV or zstd-compressed Parquet. Returns the row count."""
+    count = 0
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        schema = parquet_schema()
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for df in iter_export_frames(patient_ids, start, end, chunk_size, bind, archive_dir):
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+                count += len(df)
+    else:
+        with open(path, "w", newline="") as f:
+            header = True
+            for df in iter_export_frames(patient_ids, start, end, chunk_size, bind, archive_dir):
+                df.to_csv(f, index=False, header=header)
+                header = False
+                count += len(df)
+            if header:
+                f.write(",".join(EXPORT_COLUMNS) + "\n")
+    return count
+
+
+def export_to_tempfile(fmt="csv", **kwargs):
+    """Export into a new temporary file and return its path; the caller removes it"""
+    fd, path = tempfile.mkstemp(prefix="readings_", suffix=EXPORT_FORMATS[fmt][1])
+    os.close(fd)
+    try:
+        export_readings(path, fmt, **kwargs)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export readings to CSV or Parquet.")
+    parser.add_argument("path", help="output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="file format (default: from the extension)")
+    parser.add_argument("--patient-id", type=int, action="append", help="patient to export (repeatable, default: all)")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows read per chunk")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.path.lower().endswith(".parquet") else "csv")
+    count = export_readings(
+        args.path,
+        fmt=fmt,
+        patient_ids=args.patient_id,
+        start=args.start,
+        end=args.end + timedelta(days=1) if args.end else None,
+        chunk_size=args.chunk_size,
+    )
+    print(f"Exported {count} readings to {args.path}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+# importer.py
+"""Bulk import of readings from CSV or JSONL device exports.
+
+    python importer.py export.csv --patient-id 3 --rejects rejects.csv
+
+The file is streamed in chunks; each chunk is validated column-wise against
+the same ranges as the reading form and its valid rows are inserted with one
+driver-level executemany in one transaction. Invalid rows are written, with
+the reason, to the reject report.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from db import engine, init_db, lock_reading_inserts, Patient, Reading, READING_RANGES
+from partitions import ensure_month_partitions
+from rollups import aggregate_days, merge_partials, add_to_daily_stats
+
+INSERT_COLUMNS = ["patient_id", "timestamp", "systolic", "diastolic", "glucose_mg_dl", "temp_c", "spo2", "notes"]
+INTEGER_VITALS = ("systolic", "diastolic")
+# How the DateTime column stores values in SQLite; also a valid timestamp literal elsewhere
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def detect_format(filename):
+    """'jsonl' for .jsonl/.ndjson files, 'csv' otherwise"""
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_chunks(source, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a CSV or JSONL file (path or file object) as DataFrame chunks"""
+    if fmt == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        reader = pd.read_csv(source, chunksize=chunk_size, keep_default_na=False, na_values=[""])
+    with reader:
+        yield from reader
+
+
+def _parse_utc(raw, fmt):
+    """pd.to_datetime as UTC in ns; non-string values (e.g. epoch numbers) and
+    a column it cannot handle at all become NaT"""
+    raw = raw.where(raw.map(lambda value: isinstance(value, str)))
+    try:
+        return pd.to_datetime(raw.astype(object), errors="coerce", format=fmt, utc=True).dt.as_unit("ns")
+    except (ValueError, TypeError, OverflowError):
+        return pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns, UTC]")
+
+
+def parse_timestamps(raw):
+    """Parse ISO 8601 timestamps column-wise, falling back to per-value parsing
+    for other formats, as naive UTC like ingest.py: values with an offset are
+    converted to UTC, naive ones taken as UTC. Unparseable values are NaT."""
+    timestamps = _parse_utc(raw, "ISO8601")
+    retry = timestamps.isna() & raw.notna()
+    if retry.any():
+        timestamps = timestamps.where(~retry, _parse_utc(raw[retry], "mixed"))
+    return timestamps.dt.tz_localize(None)
+
+
+def validate_chunk(chunk, patient_id=None, known_patients=()):
+    """Split a raw chunk into (valid rows ready to insert, rejected rows with an `error` column)"""
+    errors = np.full(len(chunk), "", dtype=object)
+    ok = np.ones(len(chunk), dtype=bool)
+
+    def reject(mask, message):
+        # Only the first problem found in a row is reported
+        hit = mask.to_numpy(dtype=bool) & ok
+        errors[hit] = message
+        ok[hit] = False
+
+    rows = pd.DataFrame(index=chunk.index)
+
+    # Patient: the file's patient_id column, falling back to the one given
+    if "patient_id" in chunk:
+        pids = pd.to_numeric(chunk["patient_id"], errors="coerce")
+        if patient_id is not None:
+            pids = pids.fillna(patient_id)
+    else:
+        pids = pd.Series(patient_id, index=chunk.index, dtype="float64")
+    reject(pids.isna(), "patient_id: missing")
+    reject(pids.notna() & ~pids.isin(list(known_patients)), "patient_id: unknown patient")
+    rows["patient_id"] = pids
+
+    if "timestamp" in chunk:
+        timestamps = parse_timestamps(chunk["timestamp"])
+    else:
+        timestamps = pd.Series(pd.NaT, index=chunk.index, dtype="datetime64[ns]")
+    reject(timestamps.isna(), "timestamp: missing or unparseable")
+    rows["timestamp"] = timestamps
+
+    for vital, (low, high) in READING_RANGES.items():
+        raw = chunk[vital] if vital in chunk else pd.Series(None, index=chunk.index, dtype=object)
+        values = pd.to_numeric(raw, errors="coerce")
+        reject(raw.notna() & values.isna(), f"{vital}: not a number")
+        reject(values.notna() & ((values < low) | (values > high)), f"{vital}: outside {low}-{high}")
+        if vital in INTEGER_VITALS:
+            reject(values.notna() & (values % 1 != 0), f"{vital}: not a whole number")
+        rows[vital] = values
+
+    if "notes" in chunk:
+        notes = chunk["notes"].astype(object)
+        rows["notes"] = notes.where(notes.notna() & (notes != ""), None)
+    else:
+        rows["notes"] = None
+
+    rejected = chunk[~ok].copy()
+    rejected["error"] = errors[~ok]
+    return rows[ok], rejected
+
+
+def to_rows(rows):
+    """Insert parameters for valid rows as INSERT_COLUMNS-ordered tuples, missing values as None"""
+    columns = [rows["patient_id"].astype("int64").tolist(), rows["timestamp"].dt.strftime(TIMESTAMP_FORMAT).tolist()]
+    for name in INSERT_COLUMNS[2:]:
+        col = rows[name]
+        if name in INTEGER_VITALS:
+            col = col.astype("Int64")
+        columns.append(col.astype(object).where(col.notna(), None).tolist())
+    return list(zip(*columns))
+
+
+def insert_rows(conn, rows):
+    """executemany straight on the DBAPI cursor, bypassing per-row ORM/Core processing"""
+    lock_reading_inserts(conn)
+    placeholder = PLACEHOLDERS[conn.dialect.paramstyle]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        Reading.__tablename__, ", ".join(INSERT_COLUMNS), ", ".join([placeholder] * len(INSERT_COLUMNS))
+    )
+    conn.exec_driver_sql(sql, rows)
+
+
+def import_readings(source, fmt="csv", patient_id=None, rejects=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import readings from a CSV/JSONL path or file object.
+
+    Rows without a patient_id column value are assigned to `patient_id`.
+    `rejects` is a path or text file object that receives rejected rows as
+    CSV. Daily rollups are aggregated from the imported chunks and merged
+    into patient_daily_stats at the end (rollups.py rebuild repairs them if
+    an import is interrupted).
+    Returns {"inserted", "rejected", "patient_ids"}.
+    """
+    with engine.connect() as conn:
+        known_patients = set(conn.execute(select(Patient.id)).scalars())
+
+    result = {"inserted": 0, "rejected": 0, "patient_ids": set()}
+    partials = []
+    reject_file = open(rejects, "w", newline="") if isinstance(rejects, str) else rejects
+    write_header = True
+    try:
+        for chunk in read_chunks(source, fmt, chunk_size):
+            valid, rejected = validate_chunk(chunk, patient_id, known_patients)
+            if not valid.empty:
+                with engine.begin() as conn:
+                    ensure_month_partitions(conn, valid["timestamp"].min(), valid["timestamp"].max())
+                    insert_rows(conn, to_rows(valid))
+                result["inserted"] += len(valid)
+                result["patient_ids"].update(int(p) for p in valid["patient_id"].unique())
+                partials.append(aggregate_days(valid))
+            if not rejected.empty:
+                result["rejected"] += len(rejected)
+                if reject_file is not None:
+                    rejected.to_csv(reject_file, index=False, header=write_header)
+                    write_header = False
+    finally:
+        if isinstance(rejects, str):
+            reject_file.close()
+
+    stats = merge_partials(partials)
+    with engine.begin() as conn:
+        add_to_daily_stats(conn, stats)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import readings from a CSV or JSONL file.")
+    parser.add_argument("path", help="CSV or JSONL (.jsonl/.ndjson) file to import")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="file format (default: from the extension)")
+    parser.add_argument("--patient-id", type=int, help="patient for rows without a patient_id column value")
+    parser.add_argument("--rejects", default="rejects.csv", help="where to write rejected rows (default: rejects.csv)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk and transaction")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        parser.error(f"no such file: {args.path}")
+    init_db()
+    result = import_readings(
+        args.path,
+        fmt=args.format or detect_format(args.path),
+        patient_id=args.patient_id,
+        rejects=args.rejects,
+        chunk_size=args.chunk_size,
+    )
+    print(f"Imported {result['inserted']} readings for {len(result['patient_ids'])} patient(s).")
+    if result["rejected"]:
+        print(f"Rejected {result['rejected']} rows, see {args.rejects}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+# ingest.py
+"""HTTP ingestion service for readings pushed by devices (BP cuffs, pulse
+oximeters, CGMs), alongside the Streamlit app and on the same database.
+
+    python ingest.py --port 8502
+    curl -X POST localhost:8502/readings -H 'Content-Type: application/json' \\
+         -d '{"key": "cuff-17:000123", "patient_id": 3, "timestamp": "2025-01-01T08:00:00Z",
+              "systolic": 128, "diastolic": 82}'
+
+POST /readings takes one reading or a list of them. Every reading needs a
+client-chosen `key`; resending a reading with the same key and timestamp is
+acknowledged as a duplicate instead of stored twice, so devices can retry
+freely. Readings are queued and written in micro-batches (INGEST_BATCH_SIZE
+readings, or whatever arrived within INGEST_FLUSH_INTERVAL seconds of the
+first) in one transaction each; the response is sent once the batch holding
+its readings has committed. Validation is the bulk importer's.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from db import engine, init_db, lock_reading_inserts, Patient, Reading, READING_RANGES
+from importer import validate_chunk, INTEGER_VITALS
+from partitions import ensure_month_partitions
+from perf import recorder, section
+from rollups import aggregate_days, add_to_daily_stats
+
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_INTERVAL = float(os.environ.get("INGEST_FLUSH_INTERVAL", "0.05"))
+# Requests waiting to be written; further requests wait for room (backpressure)
+INGEST_MAX_PENDING = int(os.environ.get("INGEST_MAX_PENDING", "1000"))
+MAX_KEY_LENGTH = 200
+INGEST_FIELDS = ["key", "patient_id", "timestamp", *READING_RANGES, "notes"]
+
+
+def _utc_naive(value):
+    """ISO 8601 timestamps with an offset become naive UTC; anything else is
+    passed through for validate_chunk() to parse or reject"""
+    if not isinstance(value, str):
+        return value
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.isoformat()
+
+
+def _insert_ignoring_duplicates(conn):
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Reading.__table__).on_conflict_do_nothing(
+        index_elements=["reading_key", "timestamp"]
+    ).returning(Reading.__table__.c.reading_key, Reading.__table__.c.timestamp)
+
+
+def write_batch(readings):
+    """Validate and store one micro-batch in one transaction.
+
+    Returns one result per reading: ("inserted", None), ("duplicate", None)
+    or ("rejected", reason).
+    """
+    results = [None] * len(readings)
+    frame = pd.DataFrame.from_records(readings, columns=INGEST_FIELDS)
+    pids = pd.to_numeric(frame["patient_id"], errors="coerce").dropna().astype("int64").unique().tolist()
+
+    with engine.begin() as conn:
+        known = {pid for (pid,) in conn.execute(select(Patient.id).where(Patient.id.in_(pids)))} if pids else set()
+        valid, rejected = validate_chunk(frame, known_patients=known)
+        for i, error in zip(rejected.index, rejected["error"]):
+            results[i] = ("rejected", error)
+
+        # A reading sent twice in one batch: the first copy is the one stored
+        rows = valid.assign(reading_key=frame.loc[valid.index, "key"], patient_id=valid["patient_id"].astype("int64"))
+        repeated = rows.duplicated(["reading_key", "timestamp"]).to_numpy()
+        for i in rows.index[repeated]:
+            results[i] = ("duplicate", None)
+        rows = rows[~repeated]
+        if rows.empty:
+            return results
+
+        for vital in INTEGER_VITALS:
+            rows[vital] = rows[vital].astype("Int64")
+        records = rows.astype(object).where(rows.notna(), None).to_dict("records")
+        for record, ts in zip(records, rows["timestamp"]):
+            record["timestamp"] = ts.to_pydatetime()
+        ensure_month_partitions(conn, rows["timestamp"].min(), rows["timestamp"].max())
+        lock_reading_inserts(conn)
+        inserted = {tuple(row) for row in conn.execute(_insert_ignoring_duplicates(conn), records)}
+
+        stored = np.array([(r["reading_key"], r["timestamp"]) in inserted for r in records], dtype=bool)
+        for i, ok in zip(rows.index, stored):
+            results[i] = ("inserted", None) if ok else ("duplicate", None)
+        if stored.any():
+            add_to_daily_stats(conn, aggregate_days(rows[stored]))
+    return results
+
+
+class MicroBatcher:
+    """asyncio queue of requests' readings drained by one writer task in
+    micro-batches of about batch_size readings"""
+
+    def __init__(self, write=write_batch, batch_size=INGEST_BATCH_SIZE, flush_interval=INGEST_FLUSH_INTERVAL,
+                 max_pending=INGEST_MAX_PENDING):
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.batches = 0
+        self.readings = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Write what is queued, then stop the writer"""
+        await self.queue.join()
+        self._task.cancel()
+
+    async def submit(self, readings):
+        """Queue one request's readings and wait until they have committed;
+        returns their write_batch() results"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((readings, future))
+        return await future
+
+    def _timed_write(self, readings):
+        with section("write_batch"):
+            return self.write(readings)
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while size < self.batch_size:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _write(self, batch):
+        """Write the readings of `batch` in one transaction and resolve each request"""
+        readings = [reading for request, _ in batch for reading in request]
+        # The database work runs in a thread so requests keep being queued meanwhile
+        results = await asyncio.to_thread(self._timed_write, readings)
+        self.batches += 1
+        self.readings += len(readings)
+        start = 0
+        for request, future in batch:
+            if not future.done():
+                future.set_result(results[start:start + len(request)])
+            start += len(request)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            except Exception:
+                # Retry each request on its own, so one request's readings that
+                # fail the transaction fail only that request
+                for item in batch:
+                    try:
+                        await self._write([item])
+                    except Exception as e:
+                        if not item[1].done():
+                            item[1].set_exception(e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+def _check_reading(reading):
+    """Reason a reading cannot even be queued, or None"""
+    if not isinstance(reading, dict):
+        return "not a JSON object"
+    key = reading.get("key")
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        return f"key: required string of at most {MAX_KEY_LENGTH} characters"
+    # JSON types only; values are validated with the rest of the batch
+    patient_id = reading.get("patient_id")
+    if patient_id is not None and (isinstance(patient_id, bool) or not isinstance(patient_id, int)):
+        return "patient_id: must be an integer"
+    if not isinstance(reading.get("timestamp"), str):
+        return "timestamp: required ISO 8601 string"
+    for vital in READING_RANGES:
+        value = reading.get(vital)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float, str))):
+            return f"{vital}: must be a number"
+    if not isinstance(reading.get("notes"), (str, type(None))):
+        return "notes: must be a string"
+    return None
+
+
+async def post_readings(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "body is not valid JSON"}, status_code=400)
+    readings = body if isinstance(body, list) else [body]
+
+    rejected, queued, positions = [], [], []
+    for i, reading in enumerate(readings):
+        error = _check_reading(reading)
+        if error:
+            rejected.append({"index": i, "key": reading.get("key") if isinstance(reading, dict) else None, "error": error})
+        else:
+            queued.append({**{f: reading.get(f) for f in INGEST_FIELDS}, "timestamp": _utc_naive(reading.get("timestamp"))})
+            positions.append(i)
+
+    try:
+        results = await request.app.state.batcher.submit(queued) if queued else []
+    except Exception as e:
+        return JSONResponse({"error": f"Error saving readings: {str(e)}"}, status_code=503)
+
+    counts = {"inserted": 0, "duplicate": 0}
+    for i, reading, (status, error) in zip(positions, queued, results):
+        if status == "rejected":
+            rejected.append({"index": i, "key": reading["key"], "error": error})
+        else:
+            counts[status] += 1
+    rejected.sort(key=lambda r: r["index"])
+    return JSONResponse({"inserted": counts["inserted"], "duplicates": counts["duplicate"], "rejected": rejected})
+
+
+async def health(request):
+    batcher = request.app.state.batcher
+    return JSONResponse({"status": "ok", "pending_requests": batcher.queue.qsize(), "batches": batcher.batches, "readings": batcher.readings})
+
+
+async def metrics(request):
+    """Batch and SQL timings in Prometheus text format"""
+    return PlainTextResponse(recorder.prometheus_text(prefix="healthmate_ingest"), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    init_db()
+    recorder.instrument(engine)
+    app.state.batcher = MicroBatcher()
+    app.state.batcher.start()
+    yield
+    await app.state.batcher.stop()
+
+
+app = Starlette(
+    routes=[
+        Route("/readings", post_readings, methods=["POST"]),
+        Route("/health", health),
+        Route("/metrics", metrics),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the readings ingestion service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
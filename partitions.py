@@ -0,0 +1,180 @@
+# partitions.py
+"""Monthly time partitions of the readings table on PostgreSQL.
+
+Migration 3 turns readings into a table partitioned by month on timestamp
+(or, when the timescaledb extension is installed, a hypertable with monthly
+chunks), so a month of old readings can be archived or dropped without a
+bulk DELETE. Writers call ensure_month_partitions() for the months they
+insert into; rows for months without a partition land in readings_default.
+On SQLite readings stays a single table and these helpers do nothing.
+
+    python partitions.py list
+    python partitions.py create --through 2026-12
+    python partitions.py drop 2023-01
+"""
+import argparse
+import sys
+from datetime import date, datetime
+
+from db import engine, init_db, Reading
+
+# (database URL, month) pairs known to have a partition in this process
+_ensured = set()
+
+
+def month_start(value):
+    """First day of the month of a date or datetime"""
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"readings_{month:%Y_%m}"
+
+
+def partitioning(conn):
+    """How readings is partitioned: "timescale", "native" or None"""
+    if conn.dialect.name != "postgresql":
+        return None
+    if conn.exec_driver_sql(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'readings' AND pg_table_is_visible(c.oid)"
+    ).first():
+        return "native"
+    if conn.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'").first() and conn.exec_driver_sql(
+        "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = 'readings'"
+    ).first():
+        return "timescale"
+    return None
+
+
+def ensure_month_partitions(conn, first, last):
+    """Create the monthly partitions covering first..last (dates or datetimes)
+    that do not exist yet. A no-op unless readings is natively partitioned."""
+    if conn.dialect.name != "postgresql" or first is None:
+        return 0
+    url = str(conn.engine.url)
+    months = []
+    month = month_start(first)
+    while month <= month_start(last):
+        if (url, month) not in _ensured:
+            months.append(month)
+        month = next_month(month)
+    if not months:
+        return 0
+    if partitioning(conn) != "native":
+        _ensured.update((url, month) for month in months)
+        return 0
+    for month in months:
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF readings "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        )
+        _ensured.add((url, month))
+    return len(months)
+
+
+def month_partitions(conn):
+    """Months that have their own partition (native) or chunk (TimescaleDB), oldest first"""
+    kind = partitioning(conn)
+    if kind == "native":
+        rows = conn.exec_driver_sql(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'readings'::regclass AND c.relname <> 'readings_default'"
+        ).all()
+        return sorted(datetime.strptime(name[len("readings_"):], "%Y_%m").date() for (name,) in rows)
+    if kind == "timescale":
+        rows = conn.exec_driver_sql(
+            "SELECT range_start FROM timescaledb_information.chunks WHERE hypertable_name = 'readings'"
+        ).all()
+        return sorted({month_start(start) for (start,) in rows})
+    return []
+
+
+def drop_month_partition(conn, month):
+    """Drop every reading of `month` by dropping its partition or chunk.
+    Returns False when readings is not partitioned."""
+    month = month_start(month)
+    kind = partitioning(conn)
+    if kind == "native":
+        name = partition_name(month)
+        conn.exec_driver_sql(f"ALTER TABLE readings DETACH PARTITION {name}")
+        conn.exec_driver_sql(f"DROP TABLE {name}")
+        _ensured.discard((str(conn.engine.url), month))
+        return True
+    if kind == "timescale":
+        conn.exec_driver_sql(
+            f"SELECT drop_chunks('readings', older_than => DATE '{next_month(month).isoformat()}', "
+            f"newer_than => DATE '{month.isoformat()}')"
+        )
+        return True
+    return False
+
+
+def partition_readings(conn):
+    """Convert an unpartitioned readings table on PostgreSQL in place (migration 3)"""
+    if conn.dialect.name != "postgresql" or partitioning(conn) is not None:
+        return
+    # The partition key must be part of the primary key, and so NOT NULL
+    conn.exec_driver_sql("UPDATE readings SET \"timestamp\" = now() AT TIME ZONE 'utc' WHERE \"timestamp\" IS NULL")
+    if conn.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'").first():
+        conn.exec_driver_sql("ALTER TABLE readings DROP CONSTRAINT readings_pkey")
+        conn.exec_driver_sql('ALTER TABLE readings ADD PRIMARY KEY (id, "timestamp")')
+        conn.exec_driver_sql(
+            "SELECT create_hypertable('readings', 'timestamp', "
+            "chunk_time_interval => INTERVAL '1 month', migrate_data => true)"
+        )
+        return
+
+    first, last = conn.exec_driver_sql('SELECT min("timestamp"), max("timestamp") FROM readings').one()
+    sequence = conn.exec_driver_sql("SELECT pg_get_serial_sequence('readings', 'id')").scalar()
+    conn.exec_driver_sql("ALTER TABLE readings RENAME TO readings_unpartitioned")
+    conn.exec_driver_sql(
+        'CREATE TABLE readings (LIKE readings_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'
+    )
+    conn.exec_driver_sql("CREATE TABLE readings_default PARTITION OF readings DEFAULT")
+    ensure_month_partitions(conn, first, last)
+    conn.exec_driver_sql("INSERT INTO readings SELECT * FROM readings_unpartitioned")
+    if sequence:
+        # Keep the id sequence when the old table (its owner) is dropped
+        conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY readings.id")
+    conn.exec_driver_sql("DROP TABLE readings_unpartitioned")
+    conn.exec_driver_sql('ALTER TABLE readings ADD PRIMARY KEY (id, "timestamp")')
+    conn.exec_driver_sql("ALTER TABLE readings ADD FOREIGN KEY (patient_id) REFERENCES patients (id)")
+    for index in Reading.__table__.indexes:
+        index.create(bind=conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the readings table (PostgreSQL).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list months with a partition")
+    create = sub.add_parser("create", help="create partitions from the current month on")
+    create.add_argument("--through", required=True, type=lambda s: datetime.strptime(s, "%Y-%m").date(), help="last month (YYYY-MM)")
+    drop = sub.add_parser("drop", help="drop a month of readings")
+    drop.add_argument("month", type=lambda s: datetime.strptime(s, "%Y-%m").date(), help="month (YYYY-MM)")
+    args = parser.parse_args(argv)
+
+    init_db()
+    with engine.begin() as conn:
+        kind = partitioning(conn)
+        if kind is None:
+            print("readings is not partitioned (SQLite, or migration 3 has not run).")
+            return 1
+        if args.command == "list":
+            for month in month_partitions(conn):
+                print(f"{month:%Y-%m}")
+        elif args.command == "create":
+            count = ensure_month_partitions(conn, datetime.utcnow().date(), args.through)
+            print(f"Created {count} partitions ({kind}).")
+        else:
+            drop_month_partition(conn, args.month)
+            print(f"Dropped readings of {args.month:%Y-%m}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
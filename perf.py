@@ -0,0 +1,194 @@
+# perf.py
+"""Lightweight timing of app sections and SQL queries.
+
+    with section("history"):
+        ...
+
+Sections nest; every query executed on an instrumented engine is counted
+against the innermost open section of its thread. Totals since start are
+exported in Prometheus text format (prometheus_text()); each finished
+Streamlit rerun is kept as a per-section breakdown, and appended as one
+JSON line to PERF_LOG when that is set. Recording costs a few
+microseconds per section or query, so it is always on.
+"""
+import heapq
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+# Append one JSON line per finished rerun to this file
+PERF_LOG = os.environ.get("PERF_LOG")
+# Slowest queries kept since start
+PERF_SLOW_QUERIES = int(os.environ.get("PERF_SLOW_QUERIES", "20"))
+MAX_STATEMENT_LENGTH = 500
+NO_SECTION = "(none)"
+
+
+class PerfRecorder:
+    def __init__(self, slow_queries=PERF_SLOW_QUERIES, log_path=PERF_LOG):
+        self.slow_queries = slow_queries
+        self.log_path = log_path
+        self._sections = {}  # name -> [count, seconds, max seconds]
+        self._queries = {}  # section -> [count, seconds]
+        self._runs = [0, 0.0]
+        self._slowest = []  # min-heap of (seconds, seq, query dict)
+        self._seq = 0
+        self._engines = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- Recording ---
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def section(self, name):
+        """Time the enclosed block as `name` (also on exceptions, e.g. st.stop())"""
+        stack = self._stack()
+        stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            stack.pop()
+            with self._lock:
+                totals = self._sections.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] = max(totals[2], seconds)
+            run = getattr(self._local, "run", None)
+            if run is not None:
+                run["sections"][name] = run["sections"].get(name, 0.0) + seconds * 1000
+                if not stack:
+                    run["_timed"] += seconds
+
+    def record_query(self, statement, seconds):
+        stack = self._stack()
+        name = stack[-1] if stack else NO_SECTION
+        with self._lock:
+            totals = self._queries.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            full = len(self._slowest) >= self.slow_queries
+            if self.slow_queries and not (full and seconds <= self._slowest[0][0]):
+                self._seq += 1
+                entry = (seconds, self._seq, {
+                    "ms": seconds * 1000, "section": name, "at": datetime.now().isoformat(timespec="seconds"),
+                    "statement": " ".join(statement.split())[:MAX_STATEMENT_LENGTH],
+                })
+                (heapq.heapreplace if full else heapq.heappush)(self._slowest, entry)
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run["queries"] += 1
+            run["query_ms"] += seconds * 1000
+
+    def instrument(self, engine):
+        """Count and time every statement executed on `engine` (once per engine)"""
+        with self._lock:
+            if engine in self._engines:
+                return
+            self._engines.add(engine)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("perf_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            self.record_query(statement, time.perf_counter() - conn.info["perf_started"].pop())
+
+        @event.listens_for(engine, "handle_error")
+        def failed(context):
+            started = context.connection.info.get("perf_started") if context.connection is not None else None
+            if started:
+                started.pop()
+
+    # --- Reruns ---
+    def start_run(self):
+        """Start collecting a breakdown of this thread's sections and queries"""
+        self._local.run = {
+            "started": datetime.now().isoformat(timespec="milliseconds"),
+            "sections": {}, "queries": 0, "query_ms": 0.0, "_t0": time.perf_counter(), "_timed": 0.0,
+        }
+
+    def finish_run(self):
+        """End this thread's run; returns its breakdown (None if none was started)"""
+        run = getattr(self._local, "run", None)
+        if run is None:
+            return None
+        self._local.run = None
+        seconds = time.perf_counter() - run.pop("_t0")
+        run["total_ms"] = seconds * 1000
+        # Outside every section: widget and element rendering, unsectioned code
+        run["untimed_ms"] = (seconds - run.pop("_timed")) * 1000
+        with self._lock:
+            self._runs[0] += 1
+            self._runs[1] += seconds
+        if self.log_path:
+            line = json.dumps(run) + "\n"
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return run
+
+    # --- Export ---
+    def snapshot(self):
+        with self._lock:
+            return {
+                "runs": {"count": self._runs[0], "seconds": self._runs[1]},
+                "sections": {name: {"count": c, "seconds": s, "max_seconds": m} for name, (c, s, m) in self._sections.items()},
+                "queries": {name: {"count": c, "seconds": s} for name, (c, s) in self._queries.items()},
+                "slowest_queries": [entry for _, _, entry in sorted(self._slowest, reverse=True)],
+            }
+
+    def prometheus_text(self, prefix="healthmate"):
+        snap = self.snapshot()
+        lines = []
+        if snap["runs"]["count"]:
+            lines += [
+                f"# HELP {prefix}_rerun_seconds Streamlit script runs.",
+                f"# TYPE {prefix}_rerun_seconds summary",
+                f"{prefix}_rerun_seconds_count {snap['runs']['count']}",
+                f"{prefix}_rerun_seconds_sum {snap['runs']['seconds']:.6f}",
+            ]
+        lines += [
+            f"# HELP {prefix}_section_seconds Time spent in instrumented sections.",
+            f"# TYPE {prefix}_section_seconds summary",
+        ]
+        for name, s in sorted(snap["sections"].items()):
+            lines += [
+                f'{prefix}_section_seconds_count{{section="{_label(name)}"}} {s["count"]}',
+                f'{prefix}_section_seconds_sum{{section="{_label(name)}"}} {s["seconds"]:.6f}',
+            ]
+        lines += [
+            f"# HELP {prefix}_section_max_seconds Slowest single pass through each section.",
+            f"# TYPE {prefix}_section_max_seconds gauge",
+        ]
+        lines += [f'{prefix}_section_max_seconds{{section="{_label(name)}"}} {s["max_seconds"]:.6f}'
+                  for name, s in sorted(snap["sections"].items())]
+        lines += [
+            f"# HELP {prefix}_query_seconds SQL statements by the section that ran them.",
+            f"# TYPE {prefix}_query_seconds summary",
+        ]
+        for name, q in sorted(snap["queries"].items()):
+            lines += [
+                f'{prefix}_query_seconds_count{{section="{_label(name)}"}} {q["count"]}',
+                f'{prefix}_query_seconds_sum{{section="{_label(name)}"}} {q["seconds"]:.6f}',
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+recorder = PerfRecorder()
+section = recorder.section
@@ -0,0 +1,175 @@
+# queries.py
+import math
+from types import SimpleNamespace
+import pandas as pd
+from sqlalchemy import select, func, cast, and_, or_, type_coerce, Integer, String
+from db import Patient, Reading
+from perf import section
+
+# --- Patients ---
+def get_patient(session, patient_id):
+    """Patient details as a plain object (safe to cache and share), or None"""
+    row = session.execute(
+        select(Patient.id, Patient.name, Patient.dob, Patient.sex, Patient.notes).where(Patient.id == patient_id)
+    ).first()
+    return SimpleNamespace(**row._mapping) if row is not None else None
+
+# --- Readings as typed DataFrames ---
+READING_COLUMNS = ["id", "timestamp", "systolic", "diastolic", "glucose_mg_dl", "temp_c", "spo2", "notes"]
+READING_DTYPES = {
+    "patient_id": "int64",
+    "id": "int64",
+    "systolic": "Int64",
+    "diastolic": "Int64",
+    "glucose_mg_dl": "float64",
+    "temp_c": "float64",
+    "spo2": "float64",
+    "notes": "object",
+}
+
+def readings_select(patient_id, before=None, where=()):
+    """Core select of the reading columns for one patient, newest first.
+    `before` is a (timestamp, id) keyset cursor: only older readings are returned.
+    `where` holds extra conditions, e.g. the history filters of search.reading_conditions()."""
+    stmt = select(
+        Reading.id,
+        # Raw column value: parsed once per column by pandas instead of once per row
+        type_coerce(Reading.timestamp, String).label("timestamp"),
+        Reading.systolic,
+        Reading.diastolic,
+        Reading.glucose_mg_dl,
+        Reading.temp_c,
+        Reading.spo2,
+        Reading.notes,
+    ).where(Reading.patient_id == patient_id, *where)
+    if before is not None:
+        ts, rid = before
+        stmt = stmt.where(or_(Reading.timestamp < ts, and_(Reading.timestamp == ts, Reading.id < rid)))
+    return stmt.order_by(Reading.timestamp.desc(), Reading.id.desc())
+
+EXPORT_COLUMNS = ["patient_id", "id", "timestamp", "systolic", "diastolic", "glucose_mg_dl", "temp_c", "spo2", "notes"]
+
+def export_select(patient_ids=None, start=None, end=None):
+    """Readings of the given patients (all when None) with start <= timestamp < end,
+    ordered by patient and time"""
+    stmt = select(
+        Reading.patient_id,
+        Reading.id,
+        type_coerce(Reading.timestamp, String).label("timestamp"),
+        Reading.systolic,
+        Reading.diastolic,
+        Reading.glucose_mg_dl,
+        Reading.temp_c,
+        Reading.spo2,
+        Reading.notes,
+    )
+    if patient_ids is not None:
+        stmt = stmt.where(Reading.patient_id.in_(patient_ids))
+    if start is not None:
+        stmt = stmt.where(Reading.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(Reading.timestamp < end)
+    return stmt.order_by(Reading.patient_id, Reading.timestamp, Reading.id)
+
+def frame_from_rows(rows, columns=READING_COLUMNS):
+    """Build a typed readings DataFrame from result rows holding `columns` in order"""
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df = df.astype({c: READING_DTYPES[c] for c in columns if c in READING_DTYPES})
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+    return df
+
+def readings_frame(session, patient_id, limit=None, before=None, where=()):
+    """Readings for one patient as a typed DataFrame, newest first"""
+    stmt = readings_select(patient_id, before=before, where=where)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = session.connection().execute(stmt)
+    try:
+        # Plain DBAPI tuples: skips building a Row object per reading
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+    with section("dataframe"):
+        return frame_from_rows(rows)
+
+def history_page(session, patient_id, page_size, before=None, where=()):
+    """Keyset-paginated history: up to page_size readings older than the
+    (timestamp, id) cursor `before` and matching `where`, newest first.
+    Returns (df, has_more)."""
+    df = readings_frame(session, patient_id, limit=page_size + 1, before=before, where=where)
+    return df.iloc[:page_size], len(df) > page_size
+
+def page_cursor(df):
+    """Keyset cursor that continues after the last row of a history page"""
+    last = df.iloc[-1]
+    return last["timestamp"].to_pydatetime(), int(last["id"])
+
+def as_reading(row):
+    """A DataFrame row with Reading-like attributes, missing values as None"""
+    return SimpleNamespace(**{k: (None if pd.isna(v) else v) for k, v in row.items()})
+
+# --- Trend charts ---
+TREND_VITALS = ["systolic", "diastolic", "glucose_mg_dl", "temp_c", "spo2"]
+
+def trend_frame(session, patient_id, start, end, buckets=400):
+    """min/mean/max of every vital per time bucket over [start, end], aggregated
+    in SQL. The result has at most `buckets` rows however many readings fall in
+    the window; `timestamp` is the start of each bucket and `n` its reading count."""
+    width = max(1, math.ceil((end - start).total_seconds() / buckets))
+    bucket = (cast(func.extract("epoch", Reading.timestamp), Integer) // width).label("bucket")
+    columns = [bucket, func.count().label("n")]
+    for vital in TREND_VITALS:
+        col = getattr(Reading, vital)
+        columns += [
+            func.min(col).label(f"{vital}_min"),
+            func.avg(col).label(f"{vital}_mean"),
+            func.max(col).label(f"{vital}_max"),
+        ]
+    stmt = select(*columns).where(
+        Reading.patient_id == patient_id,
+        Reading.timestamp >= start,
+        Reading.timestamp <= end,
+    ).group_by("bucket").order_by("bucket")
+    result = session.connection().execute(stmt)
+    try:
+        df = pd.DataFrame.from_records(result.cursor.fetchall(), columns=[c.name for c in columns])
+    finally:
+        result.close()
+    df = df.astype({c.name: "float64" for c in columns[2:]})
+    df.insert(0, "timestamp", pd.to_datetime(df.pop("bucket").astype("int64") * width, unit="s"))
+    return df
+
+# --- Ward overview ---
+def latest_readings_frame(session):
+    """Every patient with their latest reading (reading columns missing when
+    they have none), in one statement. Each patient's latest reading is found
+    by a correlated seek on ix_readings_patient_timestamp, so the cost grows
+    with the number of patients, not readings."""
+    latest_id = (
+        select(Reading.id)
+        .where(Reading.patient_id == Patient.id)
+        .order_by(Reading.timestamp.desc(), Reading.id.desc())
+        .limit(1)
+        .correlate(Patient)
+        .scalar_subquery()
+    )
+    stmt = select(
+        Patient.id.label("patient_id"),
+        Patient.name,
+        Reading.id,
+        type_coerce(Reading.timestamp, String).label("timestamp"),
+        Reading.systolic,
+        Reading.diastolic,
+        Reading.glucose_mg_dl,
+        Reading.temp_c,
+        Reading.spo2,
+        Reading.notes,
+    ).select_from(Patient).outerjoin(Reading, Reading.id == latest_id).order_by(Patient.name, Patient.id)
+    result = session.connection().execute(stmt)
+    try:
+        df = pd.DataFrame.from_records(result.cursor.fetchall(), columns=["patient_id", "name"] + READING_COLUMNS)
+    finally:
+        result.close()
+    df = df.astype({**READING_DTYPES, "id": "Int64"})
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+    return df
@@ -0,0 +1,386 @@
+# retention.py
+"""Retention of old raw readings: archive, downsample, delete, vacuum.
+
+For every patient and calendar month that ended more than RETENTION_DAYS
+ago, the raw readings are written to ARCHIVE_DIR/patient_<id>/<YYYY-MM>.parquet
+(zstd-compressed, the exporter's schema), deleted with ranged DELETEs,
+and replaced by one downsampled reading per hour or day (RETENTION_RESOLUTION):
+the mean of each vital, with readings.sample_count holding how many raw
+readings it stands for. Trend charts, summaries and the ward overview keep
+working from the downsampled rows; the history view reads the originals
+back from the archive (history_with_archive()) and exports merge them in
+(merge_archive()). Daily rollups of archived days stay as computed from the
+originals; `rollups.py rebuild` would recompute them from the downsampled
+rows, so their counts, min/max and abnormal counts would then describe the
+averages.
+
+Each month is one transaction, for up to RETENTION_BATCH_PATIENTS
+patients. Archive files are written before the commit and merged with any
+archive already there, so a month backfilled after archiving, or a run
+interrupted before its commit, is archived again without losing or
+duplicating readings.
+
+Deleted rows leave free pages in data.db; on SQLite with
+auto_vacuum=INCREMENTAL (new databases, or after `vacuum --full`) each run
+ends by returning them to the filesystem, VACUUM_PAGES at a time so
+writers are never blocked for long.
+
+    python retention.py once            # archive what is due, then vacuum
+    python retention.py run             # every RETENTION_INTERVAL_HOURS
+    python retention.py vacuum [--full] # --full: switch an existing database to incremental vacuum
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import select, delete, func
+
+from db import engine, init_db, Patient, Reading, PatientDailyStat
+from partitions import month_start, next_month
+from perf import section
+from queries import READING_COLUMNS, EXPORT_COLUMNS, export_select, frame_from_rows, history_page, TREND_VITALS
+from search import reading_conditions, filter_frame
+
+# Raw readings of months that ended more than this many days ago are archived
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "365"))
+# Bucket of the downsampled readings that replace them: "hour" or "day"
+RETENTION_RESOLUTION = os.environ.get("RETENTION_RESOLUTION", "day")
+RETENTION_INTERVAL_HOURS = float(os.environ.get("RETENTION_INTERVAL_HOURS", "24"))
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+# Pages returned to the filesystem per incremental vacuum step
+VACUUM_PAGES = int(os.environ.get("VACUUM_PAGES", "2000"))
+
+RESOLUTIONS = {"hour": "h", "day": "D"}
+RESOLUTION_LABELS = {"hour": "hourly", "day": "daily"}
+RETENTION_BATCH_PATIENTS = 500
+INTEGER_VITALS = ("systolic", "diastolic")
+
+
+# --- Archive files ---
+def patient_archive_dir(patient_id, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"patient_{patient_id}")
+
+
+def archive_path(patient_id, month, archive_dir=ARCHIVE_DIR):
+    return os.path.join(patient_archive_dir(patient_id, archive_dir), f"{month:%Y-%m}.parquet")
+
+
+def archived_patients(archive_dir=ARCHIVE_DIR):
+    """Ids of the patients with an archive directory, ascending"""
+    try:
+        names = os.listdir(archive_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[len("patient_"):]) for name in names if name.startswith("patient_"))
+
+
+def archived_months(patient_id, archive_dir=ARCHIVE_DIR):
+    """Months with an archive file for the patient, newest first"""
+    try:
+        names = os.listdir(patient_archive_dir(patient_id, archive_dir))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (datetime.strptime(name[:-len(".parquet")], "%Y-%m").date() for name in names if name.endswith(".parquet")),
+        reverse=True,
+    )
+
+
+def read_archive(patient_id, month, archive_dir=ARCHIVE_DIR):
+    """Archived readings of one patient-month as a typed DataFrame (export columns)"""
+    path = archive_path(patient_id, month, archive_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path).astype({"systolic": "Int64", "diastolic": "Int64"})
+    except ImportError:
+        raise RuntimeError("Reading archived readings needs pyarrow (pip install pyarrow)")
+
+
+def write_archive(df, patient_id, month, archive_dir=ARCHIVE_DIR):
+    """Replace the archive file of a patient-month with `df`, atomically"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Archiving readings needs pyarrow (pip install pyarrow)")
+    from exporter import parquet_schema
+    path = archive_path(patient_id, month, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(df[EXPORT_COLUMNS], schema=parquet_schema(), preserve_index=False),
+                   tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def remove_patient_archive(patient_id, archive_dir=ARCHIVE_DIR):
+    shutil.rmtree(patient_archive_dir(patient_id, archive_dir), ignore_errors=True)
+
+
+# --- Archiving and downsampling ---
+def downsample(df, resolution=RETENTION_RESOLUTION):
+    """One reading per patient and hour/day of `df`: the mean of each vital,
+    timestamped at the start of the bucket, with its sample_count"""
+    bucket = df["timestamp"].dt.floor(RESOLUTIONS[resolution])
+    grouped = df.groupby([df["patient_id"], bucket.rename("bucket")])
+    means = grouped[TREND_VITALS].mean()
+    for vital in TREND_VITALS:
+        means[vital] = means[vital].astype("float64").round(0 if vital in INTEGER_VITALS else 1)
+    means = means.astype({vital: "Int64" for vital in INTEGER_VITALS})
+    means["sample_count"] = grouped.size()
+    return means.reset_index().rename(columns={"bucket": "timestamp"})
+
+
+def due_months(conn, cutoff):
+    """{patient_id: first month} of every patient with raw readings before `cutoff`"""
+    rows = conn.execute(
+        select(Reading.patient_id, func.min(Reading.timestamp))
+        .where(Reading.timestamp < cutoff, Reading.sample_count.is_(None))
+        .group_by(Reading.patient_id)
+    ).all()
+    return {pid: month_start(first) for pid, first in rows}
+
+
+def archive_month(bind, patient_ids, month, resolution=RETENTION_RESOLUTION, archive_dir=ARCHIVE_DIR):
+    """Archive, delete and downsample one month of the given patients in one
+    transaction; returns (raw readings archived, downsampled readings written)"""
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(next_month(month), datetime.min.time())
+    with bind.begin() as conn:
+        rows = conn.execute(
+            export_select(patient_ids, start, end).where(Reading.sample_count.is_(None))
+        ).all()
+        if not rows:
+            return 0, 0
+        raw = frame_from_rows(rows, columns=EXPORT_COLUMNS)
+        originals = []
+        for patient_id, readings in raw.groupby("patient_id", sort=False):
+            archived = read_archive(patient_id, month, archive_dir)
+            if archived is not None:
+                readings = pd.concat([archived, readings], ignore_index=True).drop_duplicates("id", keep="last")
+                readings = readings.sort_values(["timestamp", "id"], ignore_index=True)
+            write_archive(readings, patient_id, month, archive_dir)
+            originals.append(readings)
+
+        # Raw readings and any earlier downsampled ones, in one ranged delete
+        conn.execute(delete(Reading).where(
+            Reading.patient_id.in_(raw["patient_id"].unique().tolist()),
+            Reading.timestamp >= start,
+            Reading.timestamp < end,
+        ))
+        samples = downsample(pd.concat(originals, ignore_index=True), resolution)
+        samples["notes"] = None
+        conn.execute(
+            Reading.__table__.insert(),
+            samples.astype(object).where(samples.notna(), None).to_dict("records"),
+        )
+    return len(raw), len(samples)
+
+
+def apply_retention(bind=engine, days=RETENTION_DAYS, resolution=RETENTION_RESOLUTION, archive_dir=ARCHIVE_DIR,
+                    now=None):
+    """Archive and downsample every patient-month that ended more than `days`
+    days ago, a month of up to RETENTION_BATCH_PATIENTS patients per
+    transaction; returns {"months", "archived", "downsampled"}"""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {sorted(RESOLUTIONS)}")
+    cutoff = month_start((now or datetime.utcnow()) - timedelta(days=days))
+    with bind.connect() as conn:
+        due = due_months(conn, cutoff)
+    result = {"months": 0, "archived": 0, "downsampled": 0}
+    month = min(due.values(), default=cutoff)
+    while month < cutoff:
+        patient_ids = sorted(pid for pid, first in due.items() if first <= month)
+        archived_before = result["archived"]
+        for i in range(0, len(patient_ids), RETENTION_BATCH_PATIENTS):
+            archived, downsampled = archive_month(
+                bind, patient_ids[i:i + RETENTION_BATCH_PATIENTS], month, resolution, archive_dir
+            )
+            result["archived"] += archived
+            result["downsampled"] += downsampled
+        result["months"] += result["archived"] > archived_before
+        month = next_month(month)
+    return result
+
+
+# --- Deleting and vacuuming ---
+def delete_patient_data(session, patient_id):
+    """Delete a patient and everything recorded for them with one set-based
+    DELETE per table (no per-reading ORM cascade). Archive files are left
+    to remove_patient_archive(), after the transaction commits."""
+    from alerts import delete_patient_alerts
+    session.execute(delete(Reading).where(Reading.patient_id == patient_id))
+    session.execute(delete(PatientDailyStat).where(PatientDailyStat.patient_id == patient_id))
+    delete_patient_alerts(session, patient_id)
+    session.execute(delete(Patient).where(Patient.id == patient_id))
+
+
+def incremental_vacuum(bind=engine, pages=VACUUM_PAGES):
+    """Return free pages to the filesystem, `pages` per transaction; returns
+    the number freed. Only SQLite with auto_vacuum=INCREMENTAL has any."""
+    if bind.dialect.name != "sqlite":
+        return 0
+    freed = 0
+    with bind.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        while free:
+            # Frees one page per step of the statement: fetch every step on
+            # the DBAPI cursor (a Result without columns stops after the first)
+            cursor = conn.connection.cursor()
+            cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            cursor.close()
+            conn.commit()
+            left = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if left >= free:
+                break
+            freed += free - left
+            free = left
+    return freed
+
+
+def enable_incremental_vacuum(bind=engine):
+    """Switch an existing SQLite database to auto_vacuum=INCREMENTAL. Rewrites
+    the whole file with VACUUM: run it once, while the app is stopped."""
+    if bind.dialect.name != "sqlite":
+        return False
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+    return True
+
+
+# --- History ---
+def history_with_archive(session, patient_id, page_size, before=None, filters=(), archive_dir=ARCHIVE_DIR):
+    """queries.history_page() continued into the patient's archive: up to
+    page_size original readings older than `before` matching `filters`
+    (reading_conditions() arguments), newest first, with an `archived`
+    column. Downsampled readings are left out; their originals are shown.
+    Returns (df, has_more)."""
+    where = reading_conditions(*filters) + (Reading.sample_count.is_(None),)
+    df, has_more = history_page(session, patient_id, page_size, before=before, where=where)
+    df = df.assign(archived=False)
+    months = archived_months(patient_id, archive_dir)
+    # A full page newer than everything archived needs no archive reads
+    if not months or (has_more and df["timestamp"].iloc[-1] >= pd.Timestamp(next_month(months[0]))):
+        return df, has_more
+
+    with section("archive"):
+        frames = [df]
+        needed = page_size + 1
+        for month in months:
+            if before is not None and month > before[0].date():
+                continue
+            archived = filter_frame(read_archive(patient_id, month, archive_dir), *filters)
+            if before is not None:
+                ts, rid = pd.Timestamp(before[0]), before[1]
+                archived = archived[(archived["timestamp"] < ts) | ((archived["timestamp"] == ts) & (archived["id"] < rid))]
+            frames.append(archived[READING_COLUMNS].assign(archived=True))
+            needed -= len(archived)
+            if needed <= 0:
+                break
+        merged = pd.concat(frames, ignore_index=True).sort_values(["timestamp", "id"], ascending=False, ignore_index=True)
+    return merged.iloc[:page_size], len(merged) > page_size
+
+
+# --- Export ---
+def read_patient_archive(patient_id, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    """Archived readings of one patient with start <= timestamp < end, oldest first"""
+    months = [
+        month for month in reversed(archived_months(patient_id, archive_dir))
+        if (start is None or next_month(month) > start.date()) and (end is None or month < end.date())
+    ]
+    frames = [filter_frame(read_archive(patient_id, month, archive_dir), start, end) for month in months]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True).sort_values(["timestamp", "id"], ignore_index=True)
+
+
+def merge_archive(frames, patient_ids=None, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    """Merge archived readings into `frames`, raw readings in the exporter's
+    order (patient, timestamp, id): yields frames of both in that order.
+    Holds at most one patient's archive in memory."""
+    waiting = [pid for pid in archived_patients(archive_dir) if patient_ids is None or pid in patient_ids]
+    waiting.reverse()
+    current, pending = None, None
+
+    def archive_only(below):
+        # Patients before `below` with archived readings only
+        while waiting and (below is None or waiting[-1] < below):
+            df = read_patient_archive(waiting.pop(), start, end, archive_dir)
+            if df is not None and not df.empty:
+                yield df
+
+    for df in frames:
+        parts = []
+        for pid, readings in df.groupby("patient_id", sort=False):
+            if pid != current:
+                if pending is not None and not pending.empty:
+                    parts.append(pending)
+                parts.extend(archive_only(pid))
+                pending = None
+                if waiting and waiting[-1] == pid:
+                    pending = read_patient_archive(waiting.pop(), start, end, archive_dir)
+                current = pid
+            if pending is not None and not pending.empty:
+                # Archived readings up to this frame's last reading of the patient
+                last = readings.iloc[-1]
+                due = (pending["timestamp"] < last["timestamp"]) | (
+                    (pending["timestamp"] == last["timestamp"]) & (pending["id"] < last["id"]))
+                readings = pd.concat([pending[due], readings], ignore_index=True).sort_values(["timestamp", "id"])
+                pending = pending[~due]
+            parts.append(readings)
+        if parts:
+            yield pd.concat(parts, ignore_index=True)
+    if pending is not None and not pending.empty:
+        yield pending
+    yield from archive_only(None)
+
+
+# --- CLI ---
+def run_once(days=RETENTION_DAYS, resolution=RETENTION_RESOLUTION):
+    t0 = time.perf_counter()
+    result = apply_retention(days=days, resolution=resolution)
+    freed = incremental_vacuum()
+    print(f"Archived {result['archived']} readings of {result['months']} months into "
+          f"{result['downsampled']} {RESOLUTION_LABELS[resolution]} readings; freed {freed} pages "
+          f"({time.perf_counter() - t0:.1f}s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive, downsample and vacuum old readings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help in [("once", "archive what is due and vacuum, then exit"), ("run", "repeat every --interval hours")]:
+        command = sub.add_parser(name, help=help)
+        command.add_argument("--days", type=int, default=RETENTION_DAYS, help="archive months that ended this many days ago")
+        command.add_argument("--resolution", choices=list(RESOLUTIONS), default=RETENTION_RESOLUTION)
+        command.add_argument("--interval", type=float, default=RETENTION_INTERVAL_HOURS, help="hours between runs")
+    vacuum = sub.add_parser("vacuum", help="return free pages to the filesystem")
+    vacuum.add_argument("--full", action="store_true", help="switch to incremental auto-vacuum with a full VACUUM")
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.command == "vacuum":
+        if args.full and not enable_incremental_vacuum():
+            print("VACUUM is left to PostgreSQL's autovacuum.")
+            return 1
+        print(f"Freed {incremental_vacuum()} pages.")
+        return 0
+    run_once(args.days, args.resolution)
+    if args.command == "run":
+        try:
+            while True:
+                time.sleep(args.interval * 3600)
+                run_once(args.days, args.resolution)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
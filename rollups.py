@@ -0,0 +1,207 @@
+# rollups.py
+"""Per-patient daily rollups of readings (the patient_daily_stats table).
+
+Writers that add readings merge their reading_stats() into the table with
+add_to_daily_stats(); writers that change or delete readings call
+refresh_daily_stats() for the days they touched, in the same transaction as
+the write; the patient summary then reads O(days) rollup rows
+instead of every reading. A value counts as abnormal outside the "normal"
+band of its own vital in the default rule set (RULE_SET), whichever rule
+set a session shows. To rebuild the whole table (backfill):
+
+    python rollups.py rebuild [--patient-id 3]
+
+A rebuild reads the readings table only: days archived by retention.py are
+recomputed from their downsampled readings.
+"""
+import argparse
+import sys
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, func
+
+from db import engine, init_db, PatientDailyStat
+from queries import frame_from_rows, export_select, EXPORT_COLUMNS, TREND_VITALS
+from rules import registry as rule_registry
+
+STAT_KEYS = ["patient_id", "day", "vital"]
+STAT_COLUMNS = STAT_KEYS + ["n", "total", "min_value", "max_value", "abnormal"]
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def outside_normal(values, low, high):
+    """Values outside low <= value < high (None: unbounded); NaN is not outside"""
+    outside = np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if low is not None:
+            outside |= values < low
+        if high is not None:
+            outside |= values >= high
+    return outside
+
+
+def aggregate_days(df):
+    """Rollup rows (one per patient, day and vital present) for a readings
+    DataFrame with a patient_id column"""
+    count = len(df)
+    vital_values = [df[vital].to_numpy(dtype="float64", na_value=np.nan) for vital in TREND_VITALS]
+    values = np.concatenate(vital_values)
+    # Each vital against its own input's "normal" band in the default rule set,
+    # the bounds the history filter uses too (RuleSet.normal_ranges())
+    normal = rule_registry.get().normal_ranges()
+    abnormal = np.concatenate([
+        outside_normal(v, *normal.get(vital, (None, None))) for vital, v in zip(TREND_VITALS, vital_values)
+    ])
+    present = ~np.isnan(values)
+    # One long (patient, day, vital, value) frame and a single groupby
+    long = pd.DataFrame({
+        "patient_id": np.tile(df["patient_id"].to_numpy(), len(TREND_VITALS))[present],
+        "day": np.tile(df["timestamp"].dt.normalize().to_numpy(), len(TREND_VITALS))[present],
+        "vital": np.repeat(np.arange(len(TREND_VITALS)), count)[present],
+        "value": values[present],
+        "abnormal": abnormal[present].astype("int64"),
+    })
+    stats = long.groupby(["patient_id", "day", "vital"], sort=False).agg(
+        n=("value", "size"),
+        total=("value", "sum"),
+        min_value=("value", "min"),
+        max_value=("value", "max"),
+        abnormal=("abnormal", "sum"),
+    ).reset_index()
+    stats["day"] = stats["day"].dt.date
+    stats["vital"] = np.array(TREND_VITALS, dtype=object)[stats["vital"].to_numpy()]
+    return stats
+
+
+def merge_partials(partials):
+    """Combine rollups of consecutive chunks whose days may overlap at the edges"""
+    if not partials:
+        return pd.DataFrame(columns=STAT_COLUMNS)
+    if len(partials) == 1:
+        return partials[0]
+    return pd.concat(partials, ignore_index=True).groupby(STAT_KEYS).agg(
+        n=("n", "sum"),
+        total=("total", "sum"),
+        min_value=("min_value", "min"),
+        max_value=("max_value", "max"),
+        abnormal=("abnormal", "sum"),
+    ).reset_index()
+
+
+def _typed(stats):
+    return stats.astype({"patient_id": "int64", "n": "int64", "abnormal": "int64"})
+
+
+def refresh_daily_stats(conn, patient_ids=None, first_day=None, last_day=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Recompute the rollups of the given patients (all when None) for
+    first_day..last_day inclusive (unbounded when None) from the readings table.
+
+    Runs on `conn` so it sees, and commits with, the caller's uncommitted writes.
+    """
+    start = datetime.combine(first_day, time.min) if first_day is not None else None
+    end = datetime.combine(last_day, time.min) + timedelta(days=1) if last_day is not None else None
+
+    stale = delete(PatientDailyStat)
+    if patient_ids is not None:
+        stale = stale.where(PatientDailyStat.patient_id.in_(patient_ids))
+    if first_day is not None:
+        stale = stale.where(PatientDailyStat.day >= first_day)
+    if last_day is not None:
+        stale = stale.where(PatientDailyStat.day <= last_day)
+    conn.execute(stale)
+
+    partials = []
+    result = conn.execute(export_select(patient_ids, start, end))
+    try:
+        while True:
+            rows = result.cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            partials.append(aggregate_days(frame_from_rows(rows, columns=EXPORT_COLUMNS)))
+    finally:
+        result.close()
+
+    stats = merge_partials(partials)
+    if not stats.empty:
+        conn.execute(PatientDailyStat.__table__.insert(), _typed(stats).to_dict("records"))
+    return len(stats)
+
+
+def reading_stats(readings):
+    """aggregate_days() output for unsaved Reading objects, so the rollup
+    delta is computed before the write transaction takes the database lock"""
+    columns = [c for c in EXPORT_COLUMNS if c != "id"]
+    rows = [tuple(getattr(r, c) for c in columns) for r in readings]
+    return aggregate_days(frame_from_rows(rows, columns=columns))
+
+
+def add_to_daily_stats(conn, stats):
+    """Merge aggregate_days() output for newly inserted readings into the
+    stored rollups (counts and sums add, min/max combine) with one upsert,
+    without rereading the readings table"""
+    if stats.empty:
+        return 0
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        least, greatest = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        least, greatest = func.min, func.max
+    table = PatientDailyStat.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=STAT_KEYS, set_={
+        "n": table.c.n + stmt.excluded.n,
+        "total": table.c.total + stmt.excluded.total,
+        "min_value": least(table.c.min_value, stmt.excluded.min_value),
+        "max_value": greatest(table.c.max_value, stmt.excluded.max_value),
+        "abnormal": table.c.abnormal + stmt.excluded.abnormal,
+    })
+    conn.execute(stmt, _typed(stats).to_dict("records"))
+    return len(stats)
+
+
+def rebuild_daily_stats(conn, patient_ids=None):
+    """Recompute every rollup row of the given patients (all when None)"""
+    return refresh_daily_stats(conn, patient_ids)
+
+
+def summary_stats(session, patient_id, as_of, days):
+    """Per-vital readings count, mean, min, max and abnormal count over the
+    `days` days ending on `as_of`, read from the rollup table"""
+    total = func.sum(PatientDailyStat.total)
+    n = func.sum(PatientDailyStat.n)
+    stmt = select(
+        PatientDailyStat.vital,
+        n.label("n"),
+        (total / n).label("mean"),
+        func.min(PatientDailyStat.min_value).label("min"),
+        func.max(PatientDailyStat.max_value).label("max"),
+        func.sum(PatientDailyStat.abnormal).label("abnormal"),
+    ).where(
+        PatientDailyStat.patient_id == patient_id,
+        PatientDailyStat.day > as_of - timedelta(days=days),
+        PatientDailyStat.day <= as_of,
+    ).group_by(PatientDailyStat.vital)
+    rows = session.execute(stmt).all()
+    df = pd.DataFrame(rows, columns=["vital", "n", "mean", "min", "max", "abnormal"]).set_index("vital")
+    return df.reindex([v for v in TREND_VITALS if v in df.index])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the patient_daily_stats rollup table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute rollups from the readings table")
+    rebuild.add_argument("--patient-id", type=int, action="append", help="patient to rebuild (repeatable, default: all)")
+    args = parser.parse_args(argv)
+
+    init_db()
+    with engine.begin() as conn:
+        count = rebuild_daily_stats(conn, args.patient_id)
+    print(f"Wrote {count} rollup rows.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
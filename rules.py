@@ -0,0 +1,299 @@
+# rules.py
+"""Clinical thresholds and advice as declarative rule sets.
+
+A rule set is a JSON (or YAML, with PyYAML installed) file in RULES_DIR, one
+per clinic or population (adult, pregnancy, ...). Each rule classifies one
+category column, e.g. bp_stage, from one or more vitals:
+
+    {"category": "glucose_band",
+     "categories": ["low", "normal", "impaired", "high", "very_high"],
+     "inputs": {"glucose_mg_dl": {"breakpoints": [70, 140, 200, 300],
+                                  "bands": ["low", "normal", "impaired", "high", "very_high"]}},
+     "advice": {"low": {"alert": "warning", "message": "...", "tips": ["..."]}, ...}}
+
+A value falls in bands[i] when breakpoints[i-1] <= value < breakpoints[i].
+With several inputs the band that comes first in "precedence" wins. A rule
+set can name another in "extends" and override rules of the same category.
+
+Files are compiled once into sorted breakpoint tuples/arrays and one shared
+(message, tips) tuple per band, so classifying a reading is a bisect per
+vital; RuleRegistry.reload() swaps in recompiled rule sets atomically.
+"""
+import json
+import os
+import threading
+from bisect import bisect_right
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+RULES_DIR = os.environ.get("RULES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_sets"))
+DEFAULT_RULE_SET = os.environ.get("RULE_SET", "adult")
+RULE_FILE_SUFFIXES = (".json", ".yaml", ".yml")
+
+# Alert levels in increasing urgency; every band of every rule maps to one
+ALERT_LEVELS = ["normal", "watch", "warning", "urgent"]
+
+
+class RuleError(ValueError):
+    """A rule set file that cannot be compiled"""
+
+
+def _band_index(breakpoints, values):
+    """np.searchsorted(breakpoints, values, side="right"); for the few
+    breakpoints of a vital, counting the ones passed is several times faster
+    than a binary search per value (NaN passes none)"""
+    if len(breakpoints) > 8:
+        return np.searchsorted(breakpoints, values, side="right")
+    index = np.zeros(len(values), dtype=np.intp)
+    for breakpoint in breakpoints:
+        index += values >= breakpoint
+    return index
+
+
+class CompiledRule:
+    """One category column: per-input breakpoints and band codes, and the
+    advice and alert level of every category"""
+
+    def __init__(self, spec):
+        self.category = spec["category"]
+        self.categories = tuple(spec["categories"])
+        code = {name: i for i, name in enumerate(self.categories)}
+        self.inputs = tuple(spec["inputs"])
+        self.breakpoints = []
+        self.band_codes = []
+        for name, band_spec in spec["inputs"].items():
+            breakpoints = tuple(float(b) for b in band_spec["breakpoints"])
+            if list(breakpoints) != sorted(breakpoints) or len(band_spec["bands"]) != len(breakpoints) + 1:
+                raise RuleError(f"{self.category}.{name}: breakpoints must be sorted, with one more band than breakpoints")
+            self.breakpoints.append(breakpoints)
+            self.band_codes.append(tuple(code[band] for band in band_spec["bands"]))
+        precedence = spec.get("precedence", list(reversed(self.categories)))
+        # Higher rank wins when inputs disagree
+        self.rank = tuple(len(precedence) - precedence.index(c) for c in self.categories)
+
+        advice = spec["advice"]
+        missing = set(self.categories) - set(advice)
+        if missing:
+            raise RuleError(f"{self.category}: no advice for {sorted(missing)}")
+        self.messages = tuple(advice[c]["message"] for c in self.categories)
+        self.tips = tuple(tuple(advice[c].get("tips", ())) for c in self.categories)
+        self.alerts = tuple(ALERT_LEVELS.index(advice[c]["alert"]) for c in self.categories)
+
+        # numpy copies for the vectorized path; -1 (missing) indexes the appended slot
+        self._breakpoint_arrays = [np.array(b) for b in self.breakpoints]
+        self._band_code_arrays = [np.array(c) for c in self.band_codes]
+        self._rank_array = np.array(self.rank + (-1,))
+        self._alert_array = np.array(self.alerts + (-1,))
+        self.code = self._compile_code()
+
+    def _compile_code(self):
+        """Function reading -> category code (-1 if an input is missing),
+        specialised for the common single-input rule"""
+        if len(self.inputs) == 1:
+            get = attrgetter(self.inputs[0])
+            breakpoints, band_codes = self.breakpoints[0], self.band_codes[0]
+
+            def code(reading):
+                value = get(reading)
+                return -1 if value is None else band_codes[bisect_right(breakpoints, value)]
+            return code
+
+        get = attrgetter(*self.inputs)
+        bands = list(zip(self.breakpoints, self.band_codes))
+        rank = self.rank
+
+        def code(reading):
+            best = -1
+            for value, (breakpoints, band_codes) in zip(get(reading), bands):
+                if value is None:
+                    return -1
+                c = band_codes[bisect_right(breakpoints, value)]
+                if best < 0 or rank[c] > rank[best]:
+                    best = c
+            return best
+        return code
+
+    def codes(self, df):
+        """Category codes for every row of a readings DataFrame"""
+        best = None
+        present = np.ones(len(df), dtype=bool)
+        for name, breakpoints, band_codes in zip(self.inputs, self._breakpoint_arrays, self._band_code_arrays):
+            values = df[name].to_numpy(dtype="float64", na_value=np.nan)
+            present &= ~np.isnan(values)
+            c = band_codes[_band_index(breakpoints, values)]
+            best = c if best is None else np.where(self._rank_array[c] > self._rank_array[best], c, best)
+        best[~present] = -1
+        return best
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=list(self.categories), ordered=True)
+
+    def alert_codes(self, codes):
+        return self._alert_array[codes]
+
+
+class RuleSet:
+    """A compiled rule set; immutable once built, so it can be shared by all sessions"""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.description = spec.get("description", "")
+        self.rules = tuple(CompiledRule(rule) for rule in spec["rules"])
+        self._by_category = {rule.category: rule for rule in self.rules}
+        self._coders = tuple(rule.code for rule in self.rules)
+        # Category codes of a reading -> (messages, tips); at most
+        # prod(len(categories) + 1) entries, filled on first use
+        self._advice = {}
+
+    def __getitem__(self, category):
+        return self._by_category[category]
+
+    def suggest(self, reading):
+        """(messages, tips) for one reading, as tuples shared between calls"""
+        key = tuple([code(reading) for code in self._coders])
+        advice = self._advice.get(key)
+        if advice is None:
+            present = [(rule, c) for rule, c in zip(self.rules, key) if c >= 0]
+            advice = (
+                tuple(rule.messages[c] for rule, c in present),
+                tuple(tip for rule, c in present for tip in rule.tips[c]),
+            )
+            self._advice[key] = advice
+        return advice
+
+    def classify(self, df):
+        """One ordered categorical column per rule, same index as df"""
+        return pd.DataFrame({rule.category: rule.categorical(rule.codes(df)) for rule in self.rules}, index=df.index)
+
+    def normal_ranges(self):
+        """{vital: (low, high)} of the "normal" band of every input, the
+        bounds counting as normal for low <= value < high (None: unbounded).
+        The same band the daily rollups count abnormal readings against."""
+        ranges = {}
+        for rule in self.rules:
+            if "normal" not in rule.categories:
+                continue
+            normal = rule.categories.index("normal")
+            for vital, breakpoints, band_codes in zip(rule.inputs, rule.breakpoints, rule.band_codes):
+                if normal in band_codes:
+                    i = band_codes.index(normal)
+                    ranges[vital] = (breakpoints[i - 1] if i > 0 else None,
+                                     breakpoints[i] if i < len(breakpoints) else None)
+        return ranges
+
+    def alert_levels(self, categories):
+        """Highest alert level across the category columns of each row"""
+        level = np.full(len(categories), -1)
+        for rule in self.rules:
+            level = np.maximum(level, rule.alert_codes(categories[rule.category].cat.codes.to_numpy()))
+        return pd.Categorical.from_codes(level, categories=ALERT_LEVELS, ordered=True)
+
+
+def _load_file(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError:
+            raise RuleError(f"{os.path.basename(path)}: YAML rule sets need PyYAML (pip install pyyaml)")
+        return yaml.safe_load(f)
+
+
+def _merge(base, override):
+    """Rules of `override` replace or extend those of `base` by category;
+    advice is merged per band"""
+    rules = {rule["category"]: dict(rule) for rule in base["rules"]}
+    for rule in override.get("rules", []):
+        merged = rules.setdefault(rule["category"], {})
+        advice = {band: dict(a) for band, a in merged.get("advice", {}).items()}
+        for band, a in rule.get("advice", {}).items():
+            advice.setdefault(band, {}).update(a)
+        merged.update(rule)
+        merged["advice"] = advice
+    spec = {**base, **override}
+    spec["rules"] = list(rules.values())
+    return spec
+
+
+def compile_specs(specs):
+    """{name: RuleSet} from {name: parsed file}, resolving "extends" """
+    resolved = {}
+
+    def resolve(name, seen=()):
+        if name in seen:
+            raise RuleError(f"{name}: circular extends")
+        if name not in resolved:
+            spec = specs[name]
+            parent = spec.get("extends")
+            if parent is not None:
+                if parent not in specs:
+                    raise RuleError(f"{name}: extends unknown rule set {parent!r}")
+                spec = _merge(resolve(parent, seen + (name,)), spec)
+            resolved[name] = spec
+        return resolved[name]
+
+    compiled = {}
+    for name in specs:
+        spec = dict(resolve(name), name=name)
+        try:
+            compiled[name] = RuleSet(spec)
+        except (KeyError, ValueError) as e:
+            raise RuleError(f"{name}: {e}") from e
+    return compiled
+
+
+class RuleRegistry:
+    """Compiled rule sets of a directory, recompiled when its files change.
+
+    Readers just call get(); reload() compiles every file first and then
+    replaces the whole mapping, so a broken edit leaves the previous rule
+    sets in place and evaluations never see a half-loaded set.
+    """
+
+    def __init__(self, directory=RULES_DIR, default=DEFAULT_RULE_SET):
+        self.directory = directory
+        self.default = default
+        self._sets = {}
+        self._mtimes = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _files(self):
+        return sorted(
+            os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(RULE_FILE_SUFFIXES)
+        )
+
+    def reload(self):
+        with self._lock:
+            files = self._files()
+            mtimes = {path: os.path.getmtime(path) for path in files}
+            specs = {}
+            for path in files:
+                spec = _load_file(path)
+                specs[spec.get("name") or os.path.splitext(os.path.basename(path))[0]] = spec
+            compiled = compile_specs(specs)
+            if self.default not in compiled:
+                raise RuleError(f"default rule set {self.default!r} not found in {self.directory}")
+            self._sets = compiled
+            self._mtimes = mtimes
+        return list(compiled)
+
+    def reload_if_changed(self):
+        """Recompile when a file was added, removed or modified; returns True if it did"""
+        files = self._files()
+        if self._mtimes == {path: os.path.getmtime(path) for path in files}:
+            return False
+        self.reload()
+        return True
+
+    def names(self):
+        return list(self._sets)
+
+    def get(self, name=None):
+        return self._sets[name or self.default]
+
+
+registry = RuleRegistry()
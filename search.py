@@ -0,0 +1,133 @@
+# search.py
+"""Server-side patient search and reading filters, so sidebar and history
+widgets receive one page of results however large the tables get.
+
+Patients match on a name prefix through the ix_patients_name_lower
+expression index, then on words of their name or notes through an SQLite
+FTS5 index (patients_fts, kept in step with patients by triggers); other
+databases match the words with ILIKE. Reading filters are extra WHERE
+conditions for queries.readings_select(), so filtered history is read
+through ix_readings_patient_timestamp with the same keyset cursor and
+LIMIT as the unfiltered one; filter_frame() applies them to archived
+readings.
+"""
+import os
+import re
+
+import pandas as pd
+from sqlalchemy import select, func, and_, or_, not_, table, column
+
+from db import Patient, Reading
+
+# Patients offered by the sidebar search at a time
+PATIENT_SEARCH_LIMIT = int(os.environ.get("PATIENT_SEARCH_LIMIT", "50"))
+
+# External-content FTS5 table over patients: stores only the index, the
+# text stays in patients
+PATIENTS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(name, notes, content='patients', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN "
+    "INSERT INTO patients_fts(rowid, name, notes) VALUES (new.id, new.name, new.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, notes) VALUES ('delete', old.id, old.name, old.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF name, notes ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, notes) VALUES ('delete', old.id, old.name, old.notes); "
+    "INSERT INTO patients_fts(rowid, name, notes) VALUES (new.id, new.name, new.notes); END",
+]
+patients_fts = table("patients_fts", column("rowid"), column("patients_fts"))
+
+
+def create_patient_search_index(conn):
+    """Create patients_fts and its triggers and index existing patients
+    (SQLite only; elsewhere search falls back to ILIKE)"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in PATIENTS_FTS_DDL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')")
+
+
+# --- Patients ---
+def search_words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def fts_query(words):
+    """FTS5 query matching rows with a word starting with each of `words`"""
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_patients(session, text, limit=PATIENT_SEARCH_LIMIT):
+    """(id, name) of up to `limit` patients matching `text`: those whose name
+    starts with it, by name, then those with a word of their name or notes
+    starting with each of its words. Empty text: the first patients by name."""
+    prefix = text.strip().lower()
+    name_key = func.lower(Patient.name)
+    stmt = select(Patient.id, Patient.name).order_by(name_key, Patient.id)
+    if not prefix:
+        return [tuple(row) for row in session.execute(stmt.limit(limit))]
+
+    # Range scan of the index: lower(name) in [prefix, next string after every prefix match)
+    by_prefix = and_(name_key >= prefix, name_key < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    found = [tuple(row) for row in session.execute(stmt.where(by_prefix).limit(limit))]
+    words = search_words(prefix)
+    if len(found) == limit or not words:
+        return found
+
+    if session.get_bind().dialect.name == "sqlite":
+        matches = select(patients_fts.c.rowid).where(patients_fts.c.patients_fts.op("MATCH")(fts_query(words)))
+        by_words = Patient.id.in_(matches)
+    else:
+        by_words = and_(*[
+            or_(Patient.name.icontains(word, autoescape=True), Patient.notes.icontains(word, autoescape=True))
+            for word in words
+        ])
+    found += [tuple(row) for row in session.execute(stmt.where(by_words, not_(by_prefix)).limit(limit - len(found)))]
+    return found
+
+
+# --- Readings ---
+def reading_conditions(start=None, end=None, out_of_range=(), text=None):
+    """WHERE conditions of the history filters: readings taken in [start,
+    end), with any of the `out_of_range` vitals ((vital, low, high) tuples,
+    see RuleSet.normal_ranges()) outside low <= value < high, and whose
+    notes contain `text`."""
+    conditions = []
+    if start is not None:
+        conditions.append(Reading.timestamp >= start)
+    if end is not None:
+        conditions.append(Reading.timestamp < end)
+    outside = []
+    for vital, low, high in out_of_range:
+        col = getattr(Reading, vital)
+        if low is not None:
+            outside.append(col < low)
+        if high is not None:
+            outside.append(col >= high)
+    if outside:
+        conditions.append(or_(*outside))
+    if text:
+        conditions.append(Reading.notes.icontains(text, autoescape=True))
+    return tuple(conditions)
+
+
+def filter_frame(df, start=None, end=None, out_of_range=(), text=None):
+    """Rows of a readings DataFrame matching the same filters as
+    reading_conditions(), for readings read from outside the database
+    (retention archives)"""
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= df["timestamp"] >= start
+    if end is not None:
+        keep &= df["timestamp"] < end
+    if out_of_range:
+        outside = pd.Series(False, index=df.index)
+        for vital, low, high in out_of_range:
+            if low is not None:
+                outside |= (df[vital] < low).fillna(False)
+            if high is not None:
+                outside |= (df[vital] >= high).fillna(False)
+        keep &= outside
+    if text:
+        keep &= df["notes"].str.contains(text, case=False, regex=False, na=False)
+    return df[keep]
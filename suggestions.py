@@ -0,0 +1,29 @@
+# suggestions.py
+# Thresholds, messages and tips live in the rule sets of rule_sets/ (see rules.py);
+# `rules` below is a rule set name, or None for the deployment default (RULE_SET).
+from rules import registry
+
+# --- Suggestions for a single reading ---
+def suggest_for_reading(reading, rules=None):
+    """(suggestions, lifestyle_tips) for one reading. Both are tuples shared
+    by every reading that falls in the same bands: do not modify them."""
+    return registry.get(rules).suggest(reading)
+
+
+# --- Vectorized classification of many readings ---
+def classify_readings(df, rules=None):
+    """Risk categories for every row of a readings DataFrame.
+
+    Returns a DataFrame with the same index and one ordered categorical column
+    per rule (bp_stage, glucose_band, temp_band and spo2_band in the shipped
+    rule sets); a category is missing where suggest_for_reading would say
+    nothing about that vital.
+    """
+    return registry.get(rules).classify(df)
+
+
+# --- Alert levels ---
+def alert_levels(categories, rules=None):
+    """Highest alert level across the classify_readings() columns of each row;
+    missing where no vital was classified"""
+    return registry.get(rules).alert_levels(categories)
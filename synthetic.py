@@ -0,0 +1,186 @@
+# synthetic.py
+"""Synthetic patients with realistic vital-sign time series, for demos,
+load tests and benchmarks.
+
+    python synthetic.py --patients 50 --days 180 --per-day 4
+    python synthetic.py --patients 2000 --days 800 --per-day 6 --url sqlite:///big.db
+
+Each patient gets baselines of their own (some hypertensive, some
+diabetic, some with low SpO2), slow drift, a daily rhythm, meal spikes in
+glucose and measurement noise. Readings come --per-day times a day with
+jittered times, stop for multi-day gaps (about --gap-rate gaps per 30
+days), and now and then fall into an abnormal episode (about
+--episode-rate per 30 days): a hypertensive crisis, hyperglycaemia, fever,
+hypoxia or hypotension lasting hours to days. Not every reading measures
+every vital. Values stay inside READING_RANGES, so generated readings
+would pass the importer's validation, and are written with its bulk
+insert. Output is reproducible for a --seed.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from db import create_db_engine, engine, init_db, Patient, READING_RANGES, DATABASE_URL
+from importer import insert_rows, to_rows
+from partitions import ensure_month_partitions
+from rollups import aggregate_days, add_to_daily_stats
+
+FIRST_NAMES = ["Aarav", "Maya", "Liam", "Sofia", "Noah", "Zara", "Ethan", "Priya", "Lucas", "Amara",
+               "Omar", "Chloe", "Ravi", "Elena", "Kenji", "Fatima", "Mateo", "Ingrid", "Kwame", "Leila"]
+LAST_NAMES = ["Sharma", "Okafor", "Nguyen", "García", "Smith", "Kowalski", "Haddad", "Tanaka", "Silva", "Müller",
+              "Patel", "Johansson", "Mensah", "Rossi", "Cohen", "Kim", "Dubois", "Ivanova", "Ahmed", "Brown"]
+
+# Share of readings that include each vital
+MEASURED = {"bp": 0.9, "glucose_mg_dl": 0.5, "temp_c": 0.3, "spo2": 0.8}
+
+# (systolic, diastolic, glucose, temp, spo2) shift at the peak of each episode kind
+EPISODES = {
+    "hypertensive": (55, 28, 0, 0.0, 0.0),
+    "hyperglycaemic": (0, 0, 170, 0.0, 0.0),
+    "fever": (8, 4, 15, 2.3, -1.5),
+    "hypoxic": (5, 3, 0, 0.0, -9.0),
+    "hypotensive": (-35, -22, 0, 0.0, 0.0),
+}
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def patient_profile(rng):
+    """Baselines and variability of one synthetic patient"""
+    hypertensive = rng.random() < 0.3
+    diabetic = rng.random() < 0.15
+    return {
+        "systolic": rng.normal(142 if hypertensive else 118, 7),
+        "diastolic": rng.normal(91 if hypertensive else 76, 5),
+        "glucose": rng.normal(150 if diabetic else 92, 10),
+        "meal_spike": rng.uniform(60, 110) if diabetic else rng.uniform(20, 45),
+        "temp": rng.normal(36.7, 0.2),
+        "spo2": min(99.0, rng.normal(93.5 if rng.random() < 0.1 else 97.5, 0.8)),
+        "drift": rng.uniform(0.5, 2.0),  # mmHg random-walk step per day
+    }
+
+
+def reading_times(rng, start, days, per_day, gap_rate=0.5, max_gap_days=7):
+    """Seconds since `start` of each reading: per_day jittered slots a day,
+    minus multi-day gaps"""
+    interval = 86400 / per_day
+    slots = np.arange(int(days * per_day)) * interval + interval / 2
+    seconds = np.sort(slots + rng.normal(0, interval * 0.15, len(slots)))
+    seconds = seconds[(seconds >= 0) & (seconds < days * 86400)]
+    keep = np.ones(len(seconds), dtype=bool)
+    for _ in range(rng.poisson(gap_rate * days / 30)):
+        gap_start = rng.uniform(0, days * 86400)
+        keep &= ~((seconds >= gap_start) & (seconds < gap_start + rng.uniform(1, max_gap_days) * 86400))
+    return seconds[keep]
+
+
+def vital_series(rng, profile, seconds, start, episode_rate=1.0):
+    """DataFrame of the vitals of one patient at `seconds` since `start`"""
+    n = len(seconds)
+    days = seconds / 86400
+    hour = (start.hour + start.minute / 60 + seconds / 3600) % 24
+
+    # Slow drift: a daily random walk, interpolated between days
+    walk = np.cumsum(rng.normal(0, profile["drift"], int(days.max(initial=0)) + 2))
+    drift = np.interp(days, np.arange(len(walk)), walk - walk.mean())
+    # Morning surge in blood pressure and a small evening temperature rise
+    rhythm = np.cos(2 * np.pi * (hour - 9) / 24)
+    since_meal = np.min([(hour - meal) % 24 for meal in (8, 13, 19)], axis=0)
+
+    systolic = profile["systolic"] + drift + 6 * rhythm + rng.normal(0, 6, n)
+    diastolic = profile["diastolic"] + 0.5 * drift + 3 * rhythm + rng.normal(0, 4, n)
+    glucose = profile["glucose"] + profile["meal_spike"] * np.exp(-since_meal / 1.2) + rng.normal(0, 8, n)
+    temp = profile["temp"] - 0.2 * rhythm + rng.normal(0, 0.15, n)
+    spo2 = profile["spo2"] + rng.normal(0, 0.7, n)
+
+    for _ in range(rng.poisson(episode_rate * days.max(initial=0) / 30)):
+        shift = EPISODES[rng.choice(list(EPISODES))]
+        begin, length = rng.uniform(0, days.max()), rng.uniform(0.25, 3)
+        # Rises to the peak shift and recovers: triangular envelope over the episode
+        envelope = np.clip(1 - np.abs((days - begin) / (length / 2) - 1), 0, None)
+        systolic += shift[0] * envelope
+        diastolic += shift[1] * envelope
+        glucose += shift[2] * envelope
+        temp += shift[3] * envelope
+        spo2 += shift[4] * envelope
+
+    df = pd.DataFrame({
+        "systolic": np.rint(systolic), "diastolic": np.rint(diastolic), "glucose_mg_dl": np.rint(glucose),
+        "temp_c": np.round(temp, 1), "spo2": np.round(np.minimum(spo2, 100.0), 1),
+    })
+    for vital, (low, high) in READING_RANGES.items():
+        df[vital] = df[vital].clip(low, high)
+    bp = rng.random(n) < MEASURED["bp"]
+    df.loc[~bp, ["systolic", "diastolic"]] = np.nan
+    for vital in ["glucose_mg_dl", "temp_c", "spo2"]:
+        df.loc[rng.random(n) >= MEASURED[vital], vital] = np.nan
+    df = df.astype({"systolic": "Int64", "diastolic": "Int64"})
+    df.insert(0, "timestamp", pd.Timestamp(start) + pd.to_timedelta(np.rint(seconds), unit="s"))
+    return df
+
+
+def generate(bind=engine, patients=10, days=90, per_day=4, end=None, seed=0, gap_rate=0.5, episode_rate=1.0,
+             chunk_size=DEFAULT_CHUNK_SIZE):
+    """Add `patients` synthetic patients with readings over the `days` days
+    before `end` (default now), update their daily rollups, and return
+    {"patient_ids": [...], "readings": n}"""
+    rng = np.random.default_rng(seed)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    with bind.begin() as conn:
+        # Ids from the database (RETURNING), so PostgreSQL's sequence stays ahead of them
+        patient_ids = sorted(conn.execute(Patient.__table__.insert().returning(Patient.id), [{
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "dob": f"{rng.integers(1940, 2005)}-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}",
+            "sex": str(rng.choice(["Male", "Female"])), "notes": "Synthetic patient",
+        } for _ in range(patients)]).scalars())
+        ensure_month_partitions(conn, start, end)
+
+    def write(frames):
+        # One transaction per chunk keeps the journal small on large runs;
+        # rollups come from the generated frames, not by reading them back
+        df = pd.concat(frames, ignore_index=True)
+        with bind.begin() as conn:
+            insert_rows(conn, to_rows(df))
+            add_to_daily_stats(conn, aggregate_days(df))
+        return len(df)
+
+    total, frames, pending = 0, [], 0
+    for pid in patient_ids:
+        df = vital_series(rng, patient_profile(rng), reading_times(rng, start, days, per_day, gap_rate), start, episode_rate)
+        df.insert(0, "patient_id", pid)
+        df["notes"] = None
+        frames.append(df)
+        pending += len(df)
+        if pending >= chunk_size:
+            total += write(frames)
+            frames, pending = [], 0
+    if pending:
+        total += write(frames)
+    return {"patient_ids": patient_ids, "readings": total}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add synthetic patients and readings to a database.")
+    parser.add_argument("--url", default=DATABASE_URL, help="database URL (default: DATABASE_URL)")
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--days", type=int, default=90, help="days of history ending now")
+    parser.add_argument("--per-day", type=float, default=4, help="readings per patient per day")
+    parser.add_argument("--gap-rate", type=float, default=0.5, help="multi-day gaps per 30 days")
+    parser.add_argument("--episode-rate", type=float, default=1.0, help="abnormal episodes per 30 days")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bind = create_db_engine(args.url) if args.url != DATABASE_URL else engine
+    init_db(bind=bind)
+    result = generate(bind, args.patients, args.days, args.per_day, seed=args.seed,
+                      gap_rate=args.gap_rate, episode_rate=args.episode_rate)
+    print(f"Added {len(result['patient_ids'])} patients and {result['readings']} readings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())